@@ -0,0 +1,81 @@
+import argparse
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+
+from ghost_cell.entities import TroopPool, MovingTroop
+from ghost_cell.player import InProcessPlayer
+from ghost_cell.scenario_generator import ScenarioGenerator
+
+parser = argparse.ArgumentParser(description='Benchmark the referee entity memory over full games')
+parser.add_argument('--factory_count', type=int, default=15)
+parser.add_argument('--games', type=int, default=3)
+
+
+class SpreadPlayer(InProcessPlayer):
+    # Spreads a quarter of every factory above 10 troops over its own and the neutral factories, it never attacks
+    # so a game between two of them lasts the 200 turns with troops always on their way
+
+    def __init__(self, seed):
+        super().__init__()
+        self.rng = np.random.default_rng(seed)
+
+    def initialize(self, input):
+        input()
+        for _ in range(int(input())):
+            input()
+
+    def parse(self, input):
+        self.owned, self.targets = list(), list()
+        for _ in range(int(input())):
+            entity_id, entity_type, player, troops = input().split(" ")[:4]
+            if (entity_type == "FACTORY") and (player != "-1"):
+                self.targets.append(int(entity_id))
+                if (player == "1") and (int(troops) > 10):
+                    self.owned.append((int(entity_id), int(troops)))
+
+    def think(self):
+        moves = [f"MOVE {source} {self.targets[k]} {troops // 4}" for (source, troops), k in
+                 zip(self.owned, self.rng.integers(0, len(self.targets), len(self.owned)))
+                 if source != self.targets[k]]
+        return ";".join(moves) if len(moves) > 0 else "WAIT"
+
+
+class NoPool(TroopPool):
+
+    def release(self, troop):
+        pass
+
+
+def full_game(pool_class, factory_count, seed):
+    scenario = ScenarioGenerator.generate(factory_count=factory_count, rng=np.random.default_rng(seed))
+    scenario.troop_pool = pool_class()
+    scenario.players = {1: SpreadPlayer(seed), -1: SpreadPlayer(seed + 1)}
+    tracemalloc.start()
+    start = perf_counter()
+    max_troops = 0
+    while scenario.winner == -2:
+        scenario.play()
+        max_troops = max(max_troops, len(scenario.troops))
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    created = len(scenario.troop_pool.free) + len(scenario.troops) if pool_class is TroopPool else scenario.troop_id
+    return scenario.turn, max_troops, created, peak, elapsed
+
+
+def main():
+    args = parser.parse_args()
+    troop = MovingTroop(0, 1, None, None, 1, 1)
+    print(f"MovingTroop slots: {MovingTroop.__slots__}, has __dict__: {hasattr(troop, '__dict__')}")
+    print(f"{'game':>5} {'pool':>6} {'turns':>6} {'max alive':>10} {'created':>8} {'peak kB':>8} {'ms/turn':>8}")
+    for seed in range(args.games):
+        for pool_class, name in [(NoPool, "no"), (TroopPool, "yes")]:
+            turns, max_troops, created, peak, elapsed = full_game(pool_class, args.factory_count, seed)
+            print(f"{seed:>5} {name:>6} {turns:>6} {max_troops:>10} {created:>8} {peak / 1e3:>8.1f} "
+                  f"{elapsed / turns * 1e3:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
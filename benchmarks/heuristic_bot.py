@@ -0,0 +1,71 @@
+import argparse
+from time import time
+from timeit import timeit
+
+import numpy as np
+
+from benchmarks.scenario_engine import bot_state
+from ghost_cell.bots.heuristic_bot import Game, Player, Wait, PLAYER, evaluate_move, evaluate_inc, evaluate_moves, \
+    evaluate_incs
+
+parser = argparse.ArgumentParser(description='Benchmark the heuristic bot planner and its action scoring')
+parser.add_argument('--n_troops', type=int, default=100, help='troops on their way in the benchmarked state')
+parser.add_argument('--number', type=int, default=20)
+
+
+def per_pair_scores(game):
+    for source_id in np.flatnonzero(game.factories[:, PLAYER] == 1):
+        evaluate_inc(source_id, game)
+        for dest_id in range(game.factory_count):
+            if source_id != dest_id:
+                evaluate_move(source_id, dest_id, game)
+
+
+def matrix_scores(game):
+    sources = np.flatnonzero(game.factories[:, PLAYER] == 1)
+    evaluate_incs(sources, game)
+    evaluate_moves(sources, np.arange(game.factory_count), game)
+
+
+def action_list_plan(player, game):
+    plan = list()
+    while True:
+        action_list = [a for a in player.get_actions(game) if a[0].is_valid(game)]
+        best_action, _ = max(action_list, key=lambda x: x[1])
+        plan.append(best_action.str)
+        best_action.apply(game)
+        if isinstance(best_action, Wait):
+            return plan
+
+
+def timed(plan_function, factory_count, n_troops, number):
+    times, lengths = list(), list()
+    for seed in range(number):
+        game = bot_state(Game(), factory_count, n_troops, seed, p=[0.25, 0.25, 0.5])
+        start = time()
+        lengths.append(len(plan_function(Player(player_id=1), game)))
+        times.append(time() - start)
+    return np.mean(times), np.max(times), np.mean(lengths)
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'factories':>10} {'actions':>8} {'list ms':>8} {'list max':>9} {'plan ms':>8} {'plan max':>9} "
+          f"{'speedup':>8}")
+    for factory_count in range(7, 16, 2):
+        list_mean, list_max, length = timed(action_list_plan, factory_count, args.n_troops, args.number)
+        plan_mean, plan_max, _ = timed(lambda player, game: player.get_plan(game, time_limit=10000), factory_count,
+                                       args.n_troops, args.number)
+        print(f"{factory_count:>10} {length:>8.1f} {list_mean * 1e3:>8.2f} {list_max * 1e3:>9.2f} "
+              f"{plan_mean * 1e3:>8.2f} {plan_max * 1e3:>9.2f} {list_mean / plan_mean:>8.1f}")
+
+    print(f"{'factories':>10} {'per pair us':>12} {'matrix us':>10} {'speedup':>8}")
+    for factory_count in range(7, 16, 2):
+        game = bot_state(Game(), factory_count, args.n_troops, p=[0.25, 0.25, 0.5])
+        pair_time = timeit(lambda: per_pair_scores(game), number=args.number) / args.number
+        matrix_time = timeit(lambda: matrix_scores(game), number=args.number) / args.number
+        print(f"{factory_count:>10} {pair_time * 1e6:>12.1f} {matrix_time * 1e6:>10.1f} {pair_time / matrix_time:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
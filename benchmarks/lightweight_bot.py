@@ -0,0 +1,98 @@
+import argparse
+import tracemalloc
+from time import time
+from timeit import timeit
+
+import numpy as np
+
+from benchmarks.scenario_engine import bot_state
+from ghost_cell.bots.lightweight_bot import GameState, Player, ID, dijkstra, floyd_warshall
+from ghost_cell.player import LightweightPlayer
+
+parser = argparse.ArgumentParser(description='Benchmark the lightweight bot per turn computations')
+parser.add_argument('--n_troops', type=int, default=100, help='troops on their way in the benchmarked state')
+parser.add_argument('--number', type=int, default=200)
+parser.add_argument('--n_states', type=int, default=30, help='states the move allocators are compared on')
+
+
+def per_factory_costs(player):
+    factory_ids = player.state.factories[:, ID]
+    np.array([[player._required_troops_factory(factory_id) for factory_id in factory_ids]])
+    np.array([[player._available_troops_factory(factory_id) for factory_id in factory_ids]])
+
+
+def vectorized_costs(player):
+    player.moving_troops_costs, player.stationing_troops_costs = player._moving_troops_costs(), \
+        player._stationing_troops_costs()
+    player._compute_troops_required()
+    player._compute_troops_reserve()
+
+
+def all_pairs_dijkstra(distance_matrix):
+    factory_count = distance_matrix.shape[0]
+    min_distance_matrix = np.zeros((factory_count, factory_count), dtype=int)
+    step_matrix = np.zeros((factory_count, factory_count), dtype=int)
+    path_tree = dict()
+    for source in range(factory_count):
+        dijkstra(distance_matrix, source, min_distance_matrix, step_matrix, path_tree)
+
+
+def turn_allocation(player, state):
+    # Peak of the memory traced while the player reads one turn
+    tracemalloc.start()
+    player._update_from_state(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def timed_allocator(allocator, factory_count, n_troops, n_states):
+    times, moves, committed = list(), list(), list()
+    for seed in range(n_states):
+        player = Player(player_id=1, allocator=allocator, **LightweightPlayer.default_params)
+        player._update_from_state(bot_state(GameState(), factory_count, n_troops, seed))
+        start = time()
+        player.select_flow_move() if allocator == "flow" else player.select_move()
+        times.append(time() - start)
+        moves.append(len(player.action_list))
+        committed.append(sum(int(action.split(" ")[3]) for action in player.action_list))
+    return np.mean(times), np.max(times), np.mean(moves), np.mean(committed)
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'factories':>10} {'per factory ms':>15} {'vectorized ms':>14} {'speedup':>8}")
+    for factory_count in range(7, 16, 2):
+        player = Player(player_id=1, **LightweightPlayer.default_params)
+        player._update_from_state(bot_state(GameState(), factory_count, args.n_troops))
+        loop_time = timeit(lambda: per_factory_costs(player), number=args.number) / args.number
+        vector_time = timeit(lambda: vectorized_costs(player), number=args.number) / args.number
+        print(f"{factory_count:>10} {loop_time * 1e3:>15.3f} {vector_time * 1e3:>14.3f} {loop_time / vector_time:>8.1f}")
+
+    print(f"{'factories':>10} {'dijkstra ms':>15} {'floyd ms':>14} {'speedup':>8}")
+    for factory_count in range(7, 16, 2):
+        distance_matrix = bot_state(GameState(), factory_count, args.n_troops).distance_matrix
+        dijkstra_time = timeit(lambda: all_pairs_dijkstra(distance_matrix), number=args.number) / args.number
+        floyd_time = timeit(lambda: floyd_warshall(distance_matrix), number=args.number) / args.number
+        print(f"{factory_count:>10} {dijkstra_time * 1e3:>15.3f} {floyd_time * 1e3:>14.3f} "
+              f"{dijkstra_time / floyd_time:>8.1f}")
+
+    print(f"{'factories':>10} {'update us':>10} {'peak bytes':>11}")
+    for factory_count in range(7, 16, 2):
+        state = bot_state(GameState(), factory_count, args.n_troops)
+        player = Player(player_id=1, **LightweightPlayer.default_params)
+        player._update_from_state(state)
+        update_time = timeit(lambda: player._update_from_state(state), number=args.number) / args.number
+        print(f"{factory_count:>10} {update_time * 1e6:>10.1f} {turn_allocation(player, state):>11}")
+
+    print(f"{'factories':>10} {'allocator':>10} {'mean ms':>8} {'max ms':>8} {'moves':>6} {'troops':>7}")
+    for factory_count in range(7, 16, 2):
+        for allocator in ["greedy", "flow"]:
+            mean_time, max_time, moves, committed = timed_allocator(allocator, factory_count, args.n_troops,
+                                                                    args.n_states)
+            print(f"{factory_count:>10} {allocator:>10} {mean_time * 1e3:>8.3f} {max_time * 1e3:>8.3f} {moves:>6.1f} "
+                  f"{committed:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
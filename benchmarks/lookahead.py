@@ -0,0 +1,50 @@
+import argparse
+from timeit import timeit
+
+import numpy as np
+
+from benchmarks.scenario_engine import late_game_scenario
+from ghost_cell.bots.ghost_cell import Game, Move, Wait, PLAYER, lookahead
+from ghost_cell.player import WaitPlayer
+
+parser = argparse.ArgumentParser(description='Benchmark the ghost_cell bot lookahead, cloned games against the batch')
+parser.add_argument('--n_troops', type=int, default=100, help='troops on their way in the benchmarked state')
+parser.add_argument('--n_steps', type=int, default=4)
+parser.add_argument('--number', type=int, default=20)
+
+
+def lookahead_game(factory_count, n_troops, seed=0):
+    scenario = late_game_scenario(factory_count, n_troops, seed)
+    scenario.players = {1: WaitPlayer(), -1: WaitPlayer()}
+    scenario.turn = 1
+    lines = iter(scenario.input[1].split("\n"))
+    game = Game()
+    game.initialize(lambda: next(lines))
+    game.current_status(lambda: next(lines))
+    return game
+
+
+def cloned_lookahead(game, actions, n_steps):
+    for action in actions:
+        game_proj = game.clone()
+        game_proj.next_state(action)
+        for _ in range(n_steps - 1):
+            game_proj.next_state(Wait())
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'factories':>10} {'actions':>8} {'cloned ms':>10} {'batch ms':>9} {'speedup':>8}")
+    for factory_count in range(7, 16, 2):
+        game = lookahead_game(factory_count, args.n_troops)
+        sources = np.flatnonzero(game.factories[:, PLAYER] == 1)
+        actions = [Move(source=source, destination=destination, cyborg_count=count) for source in sources
+                   for destination in range(factory_count) if destination != source for count in [3, 9]] + [Wait()]
+        cloned_time = timeit(lambda: cloned_lookahead(game, actions, args.n_steps), number=args.number) / args.number
+        batch_time = timeit(lambda: lookahead(game, actions, args.n_steps), number=args.number) / args.number
+        print(f"{factory_count:>10} {len(actions):>8} {cloned_time * 1e3:>10.3f} {batch_time * 1e3:>9.3f} "
+              f"{cloned_time / batch_time:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import copy
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from ghost_cell.scenario_generator import ScenarioGenerator
+from ghost_cell.array_scenario import ArrayScenario
+from ghost_cell.player import WaitPlayer
+
+parser = argparse.ArgumentParser(description='Benchmark Scenario against ArrayScenario on late game states')
+parser.add_argument('--factory_count', type=int, default=15)
+parser.add_argument('--turns', type=int, default=10, help='turns played from the late game state')
+parser.add_argument('--repeat', type=int, default=5)
+
+
+def late_game_scenario(factory_count, n_troops, seed=0):
+    np.random.seed(seed)
+    scenario = ScenarioGenerator.generate(factory_count=factory_count)
+    max_distance = np.max(scenario.distance_matrix)
+    for _ in range(n_troops):
+        source, destination = np.random.choice(scenario.factory_count, 2, replace=False)
+        scenario.add_troop(player=np.random.choice([-1, 1]), source=scenario.factories[source],
+                           destination=scenario.factories[destination], troops=np.random.randint(1, 10),
+                           distance=np.random.randint(1, max_distance + 1))
+    scenario.turn = 100
+    return scenario
+
+
+def bot_state(state, factory_count, n_troops, seed=0, p=None):
+    # Late game scenario with randomly owned factories, parsed by a bot state from the first turn input
+    scenario = late_game_scenario(factory_count, n_troops, seed)
+    rng = np.random.default_rng(seed)
+    for factory in scenario.factories:
+        factory.player, factory.troops = int(rng.choice([-1, 0, 1], p=p)), int(rng.integers(0, 60))
+    scenario.players = {1: WaitPlayer(), -1: WaitPlayer()}
+    scenario.turn = 1
+    lines = iter(scenario.input[1].split("\n"))
+    state.initialize(lambda: next(lines))
+    state.current_status(lambda: next(lines))
+    return state
+
+
+def time_turns(make_scenario, turns, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        scenario = make_scenario()
+        scenario.players = {1: WaitPlayer(), -1: WaitPlayer()}
+        start = perf_counter()
+        for _ in range(turns):
+            scenario.play()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'troops':>8} {'Scenario ms/turn':>18} {'ArrayScenario ms/turn':>22} {'speedup':>8}")
+    for n_troops in [100, 300, 600, 1000]:
+        scenario = late_game_scenario(args.factory_count, n_troops)
+        object_time = time_turns(lambda: copy.deepcopy(scenario), args.turns, args.repeat)
+        array_time = time_turns(lambda: ArrayScenario.from_scenario(scenario), args.turns, args.repeat)
+        print(f"{n_troops:>8} {object_time / args.turns * 1e3:>18.3f} {array_time / args.turns * 1e3:>22.3f} "
+              f"{object_time / array_time:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from ghost_cell.scenario_generator import ScenarioGenerator
+from ghost_cell.constants import MIN_FACTORY_COUNT, MAX_FACTORY_COUNT
+
+parser = argparse.ArgumentParser(description='Benchmark ScenarioGenerator.generate')
+parser.add_argument('--n_maps', type=int, default=500, help='maps generated per factory count')
+parser.add_argument('--seed', type=int, default=0)
+
+
+def time_generate(factory_count, n_maps, seed):
+    rng = np.random.default_rng(seed)
+    start = perf_counter()
+    for _ in range(n_maps):
+        ScenarioGenerator.generate(factory_count=factory_count, rng=rng)
+    return perf_counter() - start
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'factories':>10} {'ms/map':>8}")
+    total = 0
+    for factory_count in range(MIN_FACTORY_COUNT, MAX_FACTORY_COUNT + 1, 2):
+        elapsed = time_generate(factory_count, args.n_maps, args.seed)
+        total += elapsed
+        print(f"{factory_count:>10} {elapsed / args.n_maps * 1e3:>8.3f}")
+    print(f"{'all':>10} {total / args.n_maps / len(range(MIN_FACTORY_COUNT, MAX_FACTORY_COUNT + 1, 2)) * 1e3:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
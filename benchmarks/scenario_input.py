@@ -0,0 +1,68 @@
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.scenario_engine import late_game_scenario
+from ghost_cell.array_scenario import ArrayScenario, move_entities, DIST
+from ghost_cell.player import WaitPlayer
+
+parser = argparse.ArgumentParser(description='Benchmark turn input serialization on late game states')
+parser.add_argument('--factory_count', type=int, default=15)
+parser.add_argument('--repeat', type=int, default=50)
+
+
+def time_input(make_scenario, repeat, move):
+    # Troops move and the arrived ones leave between two inputs, as they do between two turns
+    best = np.inf
+    for _ in range(repeat):
+        scenario = make_scenario()
+        scenario.input
+        move(scenario)
+        start = perf_counter()
+        scenario.input
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def move_troops(scenario):
+    scenario.elapsed += 1
+    for troop_id in scenario.arrivals.pop(scenario.elapsed, list()):
+        scenario.troop_pool.release(scenario.troops.pop(troop_id))
+
+
+def move_array_troops(array_scenario):
+    move_entities(array_scenario.troops)
+    array_scenario.troops = array_scenario.troops[array_scenario.troops[:, DIST] > 0]
+
+
+def scenario_maker(factory_count, n_troops):
+    def make_scenario():
+        scenario = late_game_scenario(factory_count, n_troops)
+        scenario.players = {1: WaitPlayer(), -1: WaitPlayer()}
+        return scenario
+    return make_scenario
+
+
+def array_scenario_maker(factory_count, n_troops):
+    make_scenario = scenario_maker(factory_count, n_troops)
+
+    def make_array_scenario():
+        scenario = make_scenario()
+        array_scenario = ArrayScenario.from_scenario(scenario)
+        array_scenario.players = scenario.players
+        return array_scenario
+    return make_array_scenario
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'troops':>8} {'Scenario ms/input':>18} {'ArrayScenario ms/input':>23}")
+    for n_troops in [300, 600, 1000]:
+        scenario_time = time_input(scenario_maker(args.factory_count, n_troops), args.repeat, move_troops)
+        array_time = time_input(array_scenario_maker(args.factory_count, n_troops), args.repeat, move_array_troops)
+        print(f"{n_troops:>8} {scenario_time * 1e3:>18.3f} {array_time * 1e3:>23.3f}")
+
+
+if __name__ == "__main__":
+    main()
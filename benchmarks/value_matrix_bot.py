@@ -0,0 +1,77 @@
+import argparse
+from time import time
+
+import numpy as np
+
+from benchmarks.scenario_engine import bot_state
+from ghost_cell.bots.value_matrix_bot import GameState, Player
+from ghost_cell.player import ValueMatrixPlayer
+
+parser = argparse.ArgumentParser(description='Benchmark the value matrix bot move allocation')
+parser.add_argument('--n_troops', type=int, default=100, help='troops on their way in the benchmarked state')
+parser.add_argument('--number', type=int, default=50)
+
+
+def full_update_from_move(player, source_id, target_id, n_cyborgs):
+    player.total_capacity -= n_cyborgs
+    player.troops_reserve_vector[source_id] -= n_cyborgs
+    player.troops_reserve_matrix[source_id, :] -= n_cyborgs
+    player.troops_required_matrix[:, target_id] -= n_cyborgs
+    player.troops_required_matrix = np.floor(player.troops_required_matrix) * (player.troops_required_matrix > 0)
+    player.total_troops_required = np.sum(player.troops_required_matrix)
+    required_move = player.troops_required_matrix > 0
+    old_troops_ratio_matrix = player.troops_ratio_matrix.copy()
+    player.troops_ratio_matrix = player.troops_reserve_matrix / (player.troops_required_matrix + 1e-6)
+    player.move_value_matrix *= player.troops_ratio_matrix / (old_troops_ratio_matrix + 1e-6) * required_move
+
+
+def full_rescan_select_move(player):
+    # Allocation loop rescanning the whole value matrix for every target and rescaling it after every move
+    for target_id in reversed(np.argsort(np.sum(player.move_value_matrix, axis=0))):
+        total_value = np.sum(player.move_value_matrix)
+        if (player.total_capacity <= 0) | (player.total_troops_required <= 0) | (total_value <= 0):
+            return
+        if np.sum(player.move_value_matrix, axis=0)[target_id] == 0:
+            continue
+        discount_ratio = player.distance_penalty_matrix[:, target_id] * player.troops_ratio_matrix[:, target_id]
+        if sum(discount_ratio) > 1:
+            ordered_sources = np.array(list(reversed(np.argsort(player.move_value_matrix[:, target_id]))))
+            ordered_sources = ordered_sources[(player.my_factories[ordered_sources]) & (ordered_sources != target_id)]
+            total_discount_ratio = 0
+            for source_id in ordered_sources:
+                n_cyborgs = int(min(1. / discount_ratio[source_id], 1.) *
+                                player.troops_reserve_matrix[source_id, target_id])
+                player.action_list.append(f"MOVE {source_id} {target_id} {n_cyborgs}")
+                total_discount_ratio += discount_ratio[source_id]
+                full_update_from_move(player, source_id, target_id, n_cyborgs)
+                if (player.total_capacity <= 0) | (player.total_troops_required <= 0):
+                    return
+                if total_discount_ratio >= 1:
+                    break
+
+
+def timed(select_move, factory_count, n_troops, number):
+    times, moves = list(), list()
+    for seed in range(number):
+        state = bot_state(GameState(), factory_count, n_troops, seed, p=[0.25, 0.25, 0.5])
+        player = Player(player_id=1, **ValueMatrixPlayer.default_params)
+        player._update_from_state(state)
+        start = time()
+        select_move(player)
+        times.append(time() - start)
+        moves.append(len(player.action_list))
+    return np.mean(times), np.mean(moves)
+
+
+def main():
+    args = parser.parse_args()
+    print(f"{'factories':>10} {'moves':>6} {'rescan us':>10} {'incremental us':>15} {'speedup':>8}")
+    for factory_count in range(7, 16, 2):
+        rescan_time, moves = timed(full_rescan_select_move, factory_count, args.n_troops, args.number)
+        incremental_time, _ = timed(Player.select_move, factory_count, args.n_troops, args.number)
+        print(f"{factory_count:>10} {moves:>6.1f} {rescan_time * 1e6:>10.1f} {incremental_time * 1e6:>15.1f} "
+              f"{rescan_time / incremental_time:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+from collections import defaultdict
+
+import numpy as np
+
+from ghost_cell.scenario import Scenario, join_input
+from ghost_cell.exception import InvalidAction
+from ghost_cell.constants import DAMAGE_DURATION, COST_INCREASE_PRODUCTION, MAX_PRODUCTION_RATE
+
+# Factory columns, same layout as the bots GameState.factories
+ID, PLAYER, TROOPS, PROD, BLOCKED = 0, 1, 2, 3, 5
+# Moving entity columns, bombs use the same table with a SIZE of 0
+FROM, TO, SIZE, DIST = 2, 3, 4, 5
+PLAYER_MAP = {-1: 1, 1: 0}
+
+
+def move_entities(entities):
+    entities[:, DIST] -= entities[:, DIST] > 0
+
+
+def produce(factories):
+    producing = (factories[:, PLAYER] != 0) & (factories[:, BLOCKED] == 0)
+    factories[:, TROOPS] += factories[:, PROD] * producing
+
+
+def resolve_battles(factories, destination, player, size):
+    incoming = np.zeros(factories.shape[0], dtype=factories.dtype)
+    np.add.at(incoming, destination, size * player)
+    incoming_player, incoming = np.sign(incoming), np.abs(incoming)
+    contested = factories[:, PLAYER] != incoming_player
+    conquered = contested & (factories[:, TROOPS] < incoming)
+    factories[:, TROOPS] = np.where(contested, np.abs(factories[:, TROOPS] - incoming), factories[:, TROOPS] + incoming)
+    factories[:, PLAYER] = np.where(conquered, incoming_player, factories[:, PLAYER])
+
+
+def explode_bombs(factories, destination):
+    # Bombs hitting the same factory in the same turn explode one after the other
+    pending = destination
+    while len(pending) > 0:
+        targets, first = np.unique(pending, return_index=True)
+        destroyed = np.maximum(np.trunc(factories[targets, TROOPS] / 2).astype(factories.dtype), 10)
+        factories[targets, TROOPS] -= destroyed
+        factories[targets, BLOCKED] = DAMAGE_DURATION
+        pending = np.delete(pending, first)
+
+
+class ArrayScenario(Scenario):
+
+    def __init__(self, factories, links):
+        super().__init__(factories, links)
+        self.factories = np.zeros((self.factory_count, 6), dtype=int)
+        for factory in factories:
+            self.factories[factory.entity_id, [ID, PLAYER, TROOPS, PROD, BLOCKED]] = \
+                factory.entity_id, factory.player, factory.troops, factory.prod, factory.blocked
+        self.troops = np.zeros((0, 6), dtype=int)
+        self.bombs = np.zeros((0, 6), dtype=int)
+        self.launched, self.armed = list(), list()
+
+    @classmethod
+    def from_scenario(cls, scenario):
+        array_scenario = cls(factories=scenario.factories, links=scenario.links)
+        troops = [[t.entity_id, t.player, t.source.entity_id, t.destination.entity_id, t.troops,
+                   scenario.troop_distance(t)] for _, t in scenario.troops.items()]
+        bombs = [[b.entity_id, b.player, b.source.entity_id, b.destination.entity_id, 0, b.distance]
+                 for _, b in scenario.bombs.items()]
+        array_scenario.troops = np.array(troops, dtype=int).reshape((-1, 6))
+        array_scenario.bombs = np.array(bombs, dtype=int).reshape((-1, 6))
+        array_scenario.bomb_counter = scenario.bomb_counter.copy()
+        array_scenario.troop_id, array_scenario.bomb_id = scenario.troop_id, scenario.bomb_id
+        array_scenario.turn = scenario.turn
+        return array_scenario
+
+    @property
+    def troop_tensor(self):
+        tensor = np.zeros((self.factory_count, np.max(self.distance_matrix) + 1, 2), dtype=int)
+        np.add.at(tensor, (self.troops[:, TO], self.troops[:, DIST], (self.troops[:, PLAYER] == -1).astype(int)),
+                  self.troops[:, SIZE])
+        return tensor
+
+    @property
+    def score(self):
+        score = defaultdict(int)
+        players = np.concatenate([self.factories[:, PLAYER], self.troops[:, PLAYER]])
+        troops = np.concatenate([self.factories[:, TROOPS], self.troops[:, SIZE]])
+        # Keep the key order of the per entity accumulation done by Scenario.score
+        _, first = np.unique(players, return_index=True)
+        for player in players[np.sort(first)]:
+            score[int(player)] = int(np.sum(troops[players == player]))
+        return score
+
+    @property
+    def entity_count(self):
+        return self.factory_count + self.troops.shape[0] + self.bombs.shape[0]
+
+    def apply_action(self, action_str, player):
+        action_data = action_str.split(" ")
+        if action_data[0] in ["WAIT", "MSG"]:
+            pass
+        elif action_data[0] == "MOVE":
+            self.apply_move(source=int(action_data[1]), destination=int(action_data[2]),
+                            n_cyborgs=int(action_data[3]), player=player)
+        elif action_data[0] == "BOMB":
+            self.apply_bomb(source=int(action_data[1]), destination=int(action_data[2]), player=player)
+        elif action_data[0] == "INC":
+            self.apply_inc(factory=int(action_data[1]), player=player)
+        else:
+            raise InvalidAction(f"Unrecognized action string: {action_str}")
+
+    def apply_move(self, source, destination, n_cyborgs, player):
+        if source == destination:
+            raise InvalidAction(f"Player {player}: move actions source must be different from destination")
+        elif self.factories[source, PLAYER] != player:
+            raise InvalidAction(f"Player {player}: does not own factory {source}")
+        else:
+            n_cyborgs = min(n_cyborgs, self.factories[source, TROOPS])
+            self.factories[source, TROOPS] -= n_cyborgs
+            self.launched.append((self.troop_id, player, source, destination, n_cyborgs,
+                                  self.distance_matrix[source, destination]))
+            self.troop_id += 1
+
+    def apply_bomb(self, source, destination, player):
+        if source == destination:
+            raise InvalidAction(f"Player {player}: bomb source must be different from destination")
+        elif self.factories[source, PLAYER] != player:
+            raise InvalidAction(f"Player {player}: does not own factory {source}")
+        elif self.bomb_counter[player] == 0:
+            raise InvalidAction(f"Player {player}: does not have bombs")
+        else:
+            self.armed.append((self.bomb_id, player, source, destination, 0, self.distance_matrix[source, destination]))
+            self.bomb_counter[player] -= 1
+            self.bomb_id += 1
+
+    def apply_inc(self, factory, player):
+        if self.factories[factory, PLAYER] != player:
+            raise InvalidAction(f"Player {player}: does not own factory {factory}")
+        elif self.factories[factory, PROD] == MAX_PRODUCTION_RATE:
+            raise InvalidAction(f"Factory {factory} cannot increment production, already 3")
+        elif self.factories[factory, TROOPS] < COST_INCREASE_PRODUCTION:
+            raise InvalidAction(f"Factory {factory}  has not enough troop for upgrade: {self.factories[factory, TROOPS]}, "
+                                f"required 10")
+        else:
+            self.factories[factory, PROD] += 1
+            self.factories[factory, TROOPS] -= COST_INCREASE_PRODUCTION
+
+    def launch(self):
+        if len(self.launched) > 0:
+            self.troops = np.concatenate([self.troops, np.array(self.launched, dtype=int)])
+        if len(self.armed) > 0:
+            self.bombs = np.concatenate([self.bombs, np.array(self.armed, dtype=int)])
+        self.launched, self.armed = list(), list()
+
+    def play(self):
+        move_entities(self.troops)
+        move_entities(self.bombs)
+        about_to_explode = self.bombs[:, DIST] == 0
+
+        in_game = self.ask_players(self.input)
+        self.launch()
+        if not in_game:
+            return
+
+        produce(self.factories)
+
+        arrived = self.troops[:, DIST] == 0
+        resolve_battles(self.factories, self.troops[arrived, TO], self.troops[arrived, PLAYER],
+                        self.troops[arrived, SIZE])
+        self.troops = self.troops[~arrived]
+
+        exploded = np.zeros(self.bombs.shape[0], dtype=bool)
+        exploded[:about_to_explode.shape[0]] = about_to_explode
+        explode_bombs(self.factories, self.bombs[exploded, TO])
+        self.bombs = self.bombs[~exploded]
+
+        self.check_win_condition()
+        self.turn += 1
+
+    @property
+    def input(self):
+        input_str = dict()
+        if self.turn == 1:
+            input_common = [str(self.factory_count), str(self.link_count)] +\
+                           [f"{s} {d} {l}" for s, d, l in self.links] + [str(self.entity_count)]
+        else:
+            input_common = [str(self.entity_count)]
+
+        factories = self.factories[:, [ID, PLAYER, TROOPS, PROD, BLOCKED]].tolist()
+        lines = [self.factory_line(factory) for factory in factories] + \
+                [(f"{i} TROOP ", p, f" {s} {d} {n} {di}") for i, p, s, d, n, di in self.troops.tolist()] + \
+                [(f"{i} BOMB ", p, f" {s} {d} {di} 0") for i, p, s, d, _, di in self.bombs.tolist()]
+        for player in self.players.keys():
+            input_str[player] = join_input(input_common, lines, player)
+        return input_str
+
+    def factory_line(self, factory):
+        i, p, t, pr, b = factory
+        cached = self.factory_lines.get(i)
+        if (cached is None) or (cached[0] != factory):
+            cached = factory, (f"{i} FACTORY ", p, f" {t} {pr} {b} 0")
+            self.factory_lines[i] = cached
+        return cached[1]
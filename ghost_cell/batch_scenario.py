@@ -0,0 +1,119 @@
+import numpy as np
+
+from ghost_cell.array_scenario import ArrayScenario, move_entities, produce, resolve_battles, explode_bombs,\
+    PLAYER, TROOPS, TO, SIZE, DIST
+from ghost_cell.constants import MAX_FACTORY_COUNT
+
+# Extra column of the batched troop and bomb tables holding the game index
+GAME = 6
+
+
+class BatchScenario:
+
+    def __init__(self, scenarios, max_factory_count=MAX_FACTORY_COUNT):
+        self.max_factory_count = max_factory_count
+        self.games = [ArrayScenario.from_scenario(scenario) for scenario in scenarios]
+        self.game_count = len(self.games)
+        self.factories = np.zeros((self.game_count, self.max_factory_count, 6), dtype=int)
+        troops, bombs = list(), list()
+        for k, game in enumerate(self.games):
+            self.factories[k, :game.factory_count] = game.factories
+            # Each game keeps working on its own block of the stacked factory table
+            game.factories = self.factories[k, :game.factory_count]
+            troops.append(np.column_stack([game.troops, np.full(game.troops.shape[0], k, dtype=int)]))
+            bombs.append(np.column_stack([game.bombs, np.full(game.bombs.shape[0], k, dtype=int)]))
+        self.troops, self.bombs = np.concatenate(troops), np.concatenate(bombs)
+        self.active = np.ones(self.game_count, dtype=bool)
+        self.turn = min([game.turn for game in self.games], default=1)
+
+    def flat_index(self, entities):
+        return entities[:, GAME] * self.max_factory_count + entities[:, TO]
+
+    def distribute(self):
+        # Hand every game its rows of the troop and bomb tables, kept sorted by game then id
+        for table, attr in [(self.troops, "troops"), (self.bombs, "bombs")]:
+            bounds = np.searchsorted(table[:, GAME], np.arange(self.game_count + 1))
+            for k in np.flatnonzero(self.active):
+                setattr(self.games[k], attr, table[bounds[k]:bounds[k + 1], :GAME])
+
+    def collect(self):
+        launched, armed = [self.troops], [self.bombs]
+        for k, game in enumerate(self.games):
+            if len(game.launched) > 0:
+                launched.append(np.column_stack([np.array(game.launched, dtype=int),
+                                                 np.full(len(game.launched), k, dtype=int)]))
+            if len(game.armed) > 0:
+                armed.append(np.column_stack([np.array(game.armed, dtype=int), np.full(len(game.armed), k, dtype=int)]))
+            game.launched, game.armed = list(), list()
+        self.troops = np.concatenate(launched)
+        self.troops = self.troops[np.argsort(self.troops[:, GAME], kind="stable")]
+        self.bombs = np.concatenate(armed)
+        self.bombs = self.bombs[np.argsort(self.bombs[:, GAME], kind="stable")]
+
+    def finish(self, finished):
+        self.distribute()
+        for k in np.flatnonzero(finished):
+            game = self.games[k]
+            game.factories, game.troops, game.bombs = game.factories.copy(), game.troops.copy(), game.bombs.copy()
+        self.active &= ~finished
+        self.troops = self.troops[self.active[self.troops[:, GAME]]]
+        self.bombs = self.bombs[self.active[self.bombs[:, GAME]]]
+
+    @property
+    def score(self):
+        score = np.zeros((self.game_count, 3), dtype=int)
+        game_index = np.repeat(np.arange(self.game_count), self.max_factory_count)
+        np.add.at(score, (game_index, self.factories[:, :, PLAYER].reshape(-1) + 1),
+                  self.factories[:, :, TROOPS].reshape(-1))
+        np.add.at(score, (self.troops[:, GAME], self.troops[:, PLAYER] + 1), self.troops[:, SIZE])
+        return score
+
+    def check_win_condition(self):
+        score = self.score
+        ally, enemy = score[:, 2], score[:, 0]
+        winner = np.where(self.turn >= 200, np.sign(ally - enemy), -2)
+        winner = np.where((ally > 0) & (enemy == 0), 1, winner)
+        winner = np.where((ally == 0) & (enemy > 0), -1, winner)
+        conquest = ((ally > 0) & (enemy == 0)) | ((ally == 0) & (enemy > 0))
+        finished = self.active & (winner != -2)
+        for k in np.flatnonzero(finished):
+            self.games[k].winner = int(winner[k])
+            self.games[k].win_condition = "conquest" if conquest[k] else "score"
+        return finished
+
+    def play(self):
+        move_entities(self.troops)
+        move_entities(self.bombs)
+        about_to_explode = self.bombs[:, DIST] == 0
+        bomb_ids = self.bombs[about_to_explode][:, [GAME, 0]]
+
+        self.distribute()
+        in_game = np.zeros(self.game_count, dtype=bool)
+        for k in np.flatnonzero(self.active):
+            self.games[k].turn = self.turn
+            in_game[k] = self.games[k].ask_players(self.games[k].input)
+        self.collect()
+        self.finish(self.active & ~in_game)
+
+        flat_factories = self.factories.reshape((-1, 6))
+        produce(flat_factories)
+
+        arrived = self.troops[:, DIST] == 0
+        resolve_battles(flat_factories, self.flat_index(self.troops[arrived]), self.troops[arrived, PLAYER],
+                        self.troops[arrived, SIZE])
+        self.troops = self.troops[~arrived]
+
+        exploded = (self.bombs[:, [GAME, 0]][:, None, :] == bomb_ids[None, :, :]).all(axis=2).any(axis=1)
+        explode_bombs(flat_factories, self.flat_index(self.bombs[exploded]))
+        self.bombs = self.bombs[~exploded]
+
+        finished = self.check_win_condition()
+        for k in np.flatnonzero(self.active):
+            self.games[k].turn = self.turn + 1
+        self.finish(finished)
+        self.turn += 1
+
+    def match(self):
+        while np.any(self.active):
+            self.play()
+        return [game.winner for game in self.games]
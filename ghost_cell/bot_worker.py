@@ -0,0 +1,26 @@
+import sys
+
+from ghost_cell.player import in_process_player
+
+NEW_GAME, READY = "NEW_GAME", "READY"
+
+
+def main():
+    bot_name = sys.argv[1]
+    player = None
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        line = line.rstrip("\n")
+        if line == NEW_GAME:
+            player = in_process_player(bot_name)
+            print(READY, flush=True)
+        else:
+            pending = [line]
+            read = lambda: pending.pop() if pending else sys.stdin.readline().rstrip("\n")
+            print(player.turn(read), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,16 @@ from time import time
 
 ID, PLAYER, TROOPS, PROD, FROM, TO, SIZE, DIST, BLOCKED = 0, 1, 2, 3, 2, 3, 4, 5, 5
 PLAYER_MAP = {-1: 1, 1: 0}
+FACTORY, TROOP, BOMB = 0, 1, 2
+ENTITY_CODES = {"FACTORY": str(FACTORY), "TROOP": str(TROOP), "BOMB": str(BOMB)}
+
+
+def read_entities(input, entity_count):
+    # Reads the whole entity block and converts it at once, entity types are replaced by their code
+    block = " ".join([input() for _ in range(entity_count)])
+    for entity_type, code in ENTITY_CODES.items():
+        block = block.replace(entity_type, code)
+    return np.fromstring(block, dtype=int, sep=" ").reshape((entity_count, 7))
 
 
 def dijkstra(distance_matrix, source, min_distance_matrix, step_matrix, path_tree):
@@ -77,24 +87,24 @@ class GameState:
     def current_status(self, input):
         self.troops[:, :, :] = 0
         self.entity_count = int(input())  # the number of entities (e.g. factories and troops)
-        for i in range(self.entity_count):
-            inputs = input().split()
-            entity_id, entity_type = int(inputs[0]), inputs[1]
-            arg_1, arg_2, arg_3, arg_4, arg_5 = int(inputs[2]), int(inputs[3]), int(inputs[4]), int(inputs[5]), int(
-                inputs[6])
-            if entity_type == "FACTORY":
-                self.update_factory(entity_id, player=arg_1, troops=arg_2, prod=arg_3, blocked=arg_4)
-            elif entity_type == "TROOP":
-                self.update_troop(entity_id, player=arg_1, source=arg_2, destination=arg_3, troops=arg_4,
-                                  distance=arg_5)
-            elif entity_type == "BOMB":
-                self.update_bomb(entity_id, player=arg_1, source=arg_2, destination=arg_3, countdown=arg_4)
+        entities = read_entities(input, self.entity_count)
+        factories = entities[entities[:, 1] == FACTORY]
+        self.factories[np.ix_(factories[:, 0], [ID, PLAYER, TROOPS, PROD, BLOCKED])] = factories[:, [0, 2, 3, 4, 5]]
+        troops = entities[entities[:, 1] == TROOP]
+        np.add.at(self.troops, (troops[:, 4], troops[:, 6], (troops[:, 2] == -1).astype(int)), troops[:, 5])
+        for entity_id, _, player, source, destination, arg_4, _ in entities[entities[:, 1] == BOMB].tolist():
+            self.update_bomb(entity_id, player=player, source=source, destination=destination, countdown=arg_4)
 
     def reset(self):
         self.troops[:, :, :] = 0
         self.bombs = dict()
 
 
+def read_only(array):
+    array.setflags(write=False)
+    return array
+
+
 class Player:
 
     def __init__(self, player_id: int, moving_troop_dist_th: int, moving_troop_discount: float,
@@ -107,23 +117,21 @@ class Player:
         self.action_list = list()
         self.player_id = player_id
 
-        self.state = None
+        self.state, self.map_state = None, None
         self.my_factories, self.enemy_factories, self.total_prod = None, None, 0
         self.prod_penalty_matrix = None
         self.bomb_state = dict()
 
     def _moving_troops_cost(self, factory_id: int):
-        troop_discount = np.array([self.moving_troop_discount ** i for i in range(self.moving_troop_dist_th + 1)])
         incoming_enemy = self.state.troops[factory_id, :self.moving_troop_dist_th + 1, PLAYER_MAP[-self.player_id]]
         incoming_ally = self.state.troops[factory_id, :self.moving_troop_dist_th + 1, PLAYER_MAP[self.player_id]]
-        return sum((incoming_enemy - incoming_ally) * troop_discount)
+        return sum((incoming_enemy - incoming_ally) * self.troop_discount)
 
     def _stationing_troops_cost(self, factory_id: int):
         enemy_factories_nearby = (self.state.factories[:, PLAYER] == -self.player_id) & \
                                  (self.state.factories[:, ID] != factory_id) & \
                                  (self.state.distance_matrix[factory_id, :] <= self.stationing_troop_dist_th)
-        factory_discount = [self.stationing_troop_discount ** max(d, 0)
-                            for d in self.state.distance_matrix[factory_id, enemy_factories_nearby]]
+        factory_discount = self.stationing_discount_matrix[factory_id, enemy_factories_nearby]
 
         nearby_enemy = self.state.factories[enemy_factories_nearby, TROOPS]
         return sum(nearby_enemy * factory_discount)
@@ -139,9 +147,21 @@ class Player:
             available_troops = troops - factory_cost - max(troop_cost, 0)
             return available_troops * (available_troops > 0)
 
-    def _compute_distance_penalty_matrix(self):
-        self.distance_penalty_matrix = np.power(np.array(self.moving_troop_discount),
-                                                np.maximum(self.state.distance_matrix - 1, 0))
+    def initialize(self, game_state: GameState):
+        # Tables depending only on the map and the hyperparameters, built once per game and never written to
+        self.map_state = game_state
+        distance_matrix = game_state.distance_matrix
+        self.moving_troop_dist_th = min(self.moving_troop_dist_th, game_state.max_distance)
+        self.stationing_troop_dist_th = min(self.stationing_troop_dist_th, game_state.max_distance)
+        self.matrix_converter = read_only(np.ones((1, game_state.factory_count)))
+        self.distance_penalty_matrix = read_only(np.power(np.array(self.moving_troop_discount),
+                                                          np.maximum(distance_matrix - 1, 0)))
+        self.troop_discount = read_only(np.array([self.moving_troop_discount ** i
+                                                  for i in range(self.moving_troop_dist_th + 1)]))
+        factory_discount = np.array([self.stationing_troop_discount ** d for d in np.arange(np.max(distance_matrix) + 1)])
+        self.stationing_discount_matrix = read_only(factory_discount[np.maximum(distance_matrix, 0)])
+        self.neighbour_order = read_only(np.argsort(distance_matrix, axis=1))
+        self.source_order = read_only(np.argsort(game_state.min_distance_matrix, axis=0))
 
     def _compute_prod_penalty_matrix(self):
         prod_vec = self.state.factories[:, PROD] * (self.state.factories[:, BLOCKED] == 0) * self.enemy_factories
@@ -188,7 +208,7 @@ class Player:
         k_neighbors = min(k, sum(self.my_factories), sum(self.enemy_factories))
         k_ally, k_enemy = 0, 0
         sum_distance_ally, sum_distance_enemy = 0, 0
-        for fid in np.argsort(self.state.distance_matrix[factory_id, :]):
+        for fid in self.neighbour_order[factory_id]:
             if fid == factory_id:
                 continue
             elif (k_ally == k_neighbors) & (k_enemy == k_neighbors):
@@ -255,8 +275,7 @@ class Player:
                     self.action_list.append(f"INC {evacuate}")
                     troops -= 10
                     increments -= 1
-                refugee = np.argsort(self.state.distance_matrix[evacuate, :])
-                for fid in refugee:
+                for fid in self.neighbour_order[evacuate]:
                     if self.my_factories[fid] & (fid != evacuate):
                         self.action_list.append(f"MOVE {evacuate} {fid} {troops + prod}")
                         break
@@ -277,7 +296,7 @@ class Player:
         for target_id in ordered_targets:
             max_troops_required = max_required_target[target_id]
             if max_troops_required <= sum(self.troops_reserve_vector):
-                ordered_sources = np.argsort(self.state.min_distance_matrix[:, target_id])
+                ordered_sources = self.source_order[:, target_id]
                 to_consider = (self.my_factories[ordered_sources]) & (ordered_sources != target_id) & \
                               (self.troops_reserve_vector[ordered_sources].reshape((-1,)) >= 1)
                 ordered_sources = ordered_sources[to_consider]
@@ -315,12 +334,11 @@ class Player:
                 self._update_after_increment(source_id)
 
     def _update_from_state(self, game_state: GameState):
+        if self.map_state is not game_state:
+            self.initialize(game_state)
         self.state = game_state
-        self.matrix_converter = np.ones((1, self.state.factory_count))
         self.my_factories = self.state.factories[:, PLAYER] == self.player_id
         self.enemy_factories = self.state.factories[:, PLAYER] == -self.player_id
-        self.moving_troop_dist_th = min(self.moving_troop_dist_th, self.state.max_distance)
-        self.stationing_troop_dist_th = min(self.stationing_troop_dist_th, self.state.max_distance)
         self.total_prod = sum(game_state.factories[self.my_factories, PROD])
 
         self.troops_vector = self.state.factories[:, TROOPS]
@@ -329,7 +347,6 @@ class Player:
         self.total_enemy_troops = sum(self.state.factories[self.enemy_factories, TROOPS])
         self.total_enemy_troops += np.sum(self.state.troops[:, :, PLAYER_MAP[-self.player_id]])
 
-        self._compute_distance_penalty_matrix()
         self._compute_prod_penalty_matrix()
         self._compute_troops_required()
         self._compute_troops_reserve()
@@ -363,6 +380,7 @@ if __name__ == "__main__":
     game.initialize(input)
     agent = Player(player_id=1, moving_troop_dist_th=5, moving_troop_discount=1., stationing_troop_dist_th=3,
                    stationing_troop_discount=0.7)
+    agent.initialize(game)
     # game loop
     while True:
         start = time()
@@ -3,16 +3,68 @@ import sys
 import math
 from copy import copy
 from collections import defaultdict
+from functools import lru_cache
 from time import time
 
 ID, PLAYER, TROOPS, PROD, FROM, TO, SIZE, DIST, BLOCKED = 0, 1, 2, 3, 2, 3, 4, 5, 5
 PLAYER_MAP = {-1: 1, 1: 0}
+FACTORY, TROOP, BOMB = 0, 1, 2
+ENTITY_CODES = {"FACTORY": str(FACTORY), "TROOP": str(TROOP), "BOMB": str(BOMB)}
+
+
+def read_entities(input, entity_count):
+    # Reads the whole entity block and converts it at once, entity types are replaced by their code
+    block = " ".join([input() for _ in range(entity_count)])
+    for entity_type, code in ENTITY_CODES.items():
+        block = block.replace(entity_type, code)
+    return np.fromstring(block, dtype=int, sep=" ").reshape((entity_count, 7))
+
+
+class TroopTimeline:
+    # Troops on their way, read and written as troops[destination, eta, player]. Etas live in a ring buffer so that
+    # bringing every troop one turn closer only moves the head slot, which holds the troops arriving now
+    def __init__(self, buffer, head=0):
+        self.buffer = buffer
+        self.head = head
+
+    @property
+    def shape(self):
+        return self.buffer.shape
+
+    def slot(self, eta):
+        if isinstance(eta, slice):
+            eta = np.arange(self.buffer.shape[1])[eta]
+        return (eta + self.head) % self.buffer.shape[1]
+
+    def index(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        return key if len(key) < 2 else (key[0], self.slot(key[1])) + key[2:]
+
+    def __getitem__(self, key):
+        return self.buffer[self.index(key)]
+
+    def __setitem__(self, key, value):
+        self.buffer[self.index(key)] = value
+
+    def __array__(self, dtype=None):
+        array = np.roll(self.buffer, -self.head, axis=1)
+        return array if dtype is None else array.astype(dtype)
+
+    def add_at(self, key, values):
+        np.add.at(self.buffer, self.index(key), values)
+
+    def advance(self):
+        self.head = (self.head + 1) % self.buffer.shape[1]
+
+    def copy(self):
+        return TroopTimeline(self.buffer.copy(), self.head)
 
 
 class Game:
     def __init__(self):
         self.player_production = {0: 0, 1: 0, -1: 0}
         self.player_troops = {0: 0, 1: 0, -1: 0}
+        self.arrivals = None
 
     def initialize(self, input):
         self.factory_count = int(input())  # the number of factories
@@ -23,7 +75,7 @@ class Game:
             self.distance_matrix[factory_1, factory_2], self.distance_matrix[factory_2, factory_1] = distance, distance
         self.max_distance = np.max(self.distance_matrix)
         self.factories = np.zeros((self.factory_count, 6))
-        self.troops = np.zeros((self.factory_count, self.max_distance + 1, 2), dtype=int)
+        self.troops = TroopTimeline(np.zeros((self.factory_count, self.max_distance + 1, 2), dtype=int))
         self.bombs = defaultdict(list)
 
     def update_factory(self, entity_id, player, troops, prod, blocked):
@@ -35,6 +87,16 @@ class Game:
 
     def update_troop(self, entity_id, player, source, destination, troops, distance):
         self.troops[destination, distance, PLAYER_MAP[player]] += troops
+        if self.arrivals is not None:
+            self.arrivals[destination, distance:, PLAYER_MAP[player]] += troops
+
+    @property
+    def cumulative_troops(self):
+        # Troops arrived at each factory by each eta, per player. Built on first use after the troops were parsed or
+        # moved, then kept up to date by update_troop as planned moves are applied
+        if self.arrivals is None:
+            self.arrivals = np.cumsum(np.asarray(self.troops), axis=1)
+        return self.arrivals
 
     def update_bomb(self, entity_id, player, source, destination, distance):
         self.bombs[distance].append({"id": entity_id, "player": player, "source": source, "destination": destination,
@@ -42,18 +104,14 @@ class Game:
 
     def current_status(self, input):
         self.entity_count = int(input())  # the number of entities (e.g. factories and troops)
-        for i in range(self.entity_count):
-            inputs = input().split()
-            entity_id, entity_type = int(inputs[0]), inputs[1]
-            arg_1, arg_2, arg_3, arg_4, arg_5 = int(inputs[2]), int(inputs[3]), int(inputs[4]), int(inputs[5]), int(
-                inputs[6])
-            if entity_type == "FACTORY":
-                self.update_factory(entity_id, player=arg_1, troops=arg_2, prod=arg_3, blocked=arg_4)
-            elif entity_type == "TROOP":
-                self.update_troop(entity_id, player=arg_1, source=arg_2, destination=arg_3, troops=arg_4,
-                                  distance=arg_5)
-            elif entity_type == "BOMB":
-                self.update_bomb(entity_id, player=arg_1, source=arg_2, destination=arg_3, distance=arg_4)
+        entities = read_entities(input, self.entity_count)
+        factories = entities[entities[:, 1] == FACTORY]
+        self.factories[np.ix_(factories[:, 0], [ID, PLAYER, TROOPS, PROD, BLOCKED])] = factories[:, [0, 2, 3, 4, 5]]
+        troops = entities[entities[:, 1] == TROOP]
+        self.troops.add_at((troops[:, 4], troops[:, 6], (troops[:, 2] == -1).astype(int)), troops[:, 5])
+        self.arrivals = None
+        for entity_id, _, player, source, destination, arg_4, _ in entities[entities[:, 1] == BOMB].tolist():
+            self.update_bomb(entity_id, player=player, source=source, destination=destination, distance=arg_4)
         self.update_stats()
 
     def clone(self):
@@ -62,6 +120,7 @@ class Game:
         game_proj.max_distance = self.max_distance
         game_proj.factories = self.factories.copy()
         game_proj.troops = self.troops.copy()
+        game_proj.arrivals = None if self.arrivals is None else self.arrivals.copy()
         game_proj.distance_matrix = self.distance_matrix
         game_proj.bombs = self.bombs.copy()
         game_proj.player_production = self.player_production.copy()
@@ -74,24 +133,26 @@ class Game:
                                                            self.factories[prod_factories, PROD], 0)
 
     def move_cyborgs(self):
-        self.troops = np.roll(self.troops, shift=-1, axis=1)
+        self.troops.advance()
+        self.arrivals = None
 
     def solve_battles(self):
-        troop_balance = self.troops[:, :, PLAYER_MAP[1]] - self.troops[:, :, PLAYER_MAP[-1]]
-        incoming, factory_troops = abs(troop_balance[:, 0]), self.factories[:, TROOPS]
-        attack_player, factory_player = np.sign(troop_balance[:, 0]), self.factories[:, PLAYER]
+        troop_balance = self.troops[:, 0, PLAYER_MAP[1]] - self.troops[:, 0, PLAYER_MAP[-1]]
+        incoming, factory_troops = abs(troop_balance), self.factories[:, TROOPS]
+        attack_player, factory_player = np.sign(troop_balance), self.factories[:, PLAYER]
         outcome_troops = np.where(factory_player == attack_player, factory_troops + incoming, factory_troops - incoming)
         outcome_player = np.where(outcome_troops >= 0, factory_player, attack_player)
         outcome_troops = np.abs(outcome_troops)
         self.factories[:, TROOPS], self.factories[:, PLAYER] = outcome_troops, outcome_player
         self.troops[:, 0] = 0
+        self.arrivals = None
 
     def update_stats(self):
         for player in [-1, 1]:
             f_player = self.factories[:, PLAYER] == player
             self.player_production[player] = np.sum(self.factories[f_player, PROD])
             self.player_troops[player] = np.sum(self.factories[f_player, TROOPS]) + \
-                                         np.sum(self.troops[:, :, PLAYER_MAP[player]])
+                                         np.sum(self.troops.buffer[:, :, PLAYER_MAP[player]])
 
     def next_state(self, action):
         # print(f"In NEXT STATE", file=sys.stderr, flush=True)
@@ -248,30 +309,45 @@ class ActionEvaluator:
     def optimize(self, action, game):
         return self.optimizer(action, game, self.criterion)
 
+    def optimize_all(self, actions, game):
+        batch_optimizer = BATCH_OPTIMIZERS.get(self.optimizer)
+        if batch_optimizer is None:
+            return [self.optimize(action, game) for action in actions]
+        return batch_optimizer(actions, game, self.criterion)
+
 
 def move_optimizer(action, game, criterion):
-    # print(f"MOVE OPTIMIZER", file=sys.stderr, flush=True)
-    init_opt = time()
-    if isinstance(action, Wait):
-        return criterion(action, game)
-    best_value = -10000
-    best_action = action
-    source_troops = game.factories[int(action.source), TROOPS]
-    for p in [0.3, 0.9]:
-        action.cyborg_count = int(source_troops * p)
-        if int(source_troops * p) == 0:
-            continue
+    return move_batch_optimizer([action], game, criterion)[0]
+
+
+def move_batch_optimizer(actions, game, criterion):
+    # Every cyborg count tried for every move goes through a single criterion call when it has a batched version
+    candidates, owners = list(), list()
+    for i, action in enumerate(actions):
+        if isinstance(action, Move):
+            source_troops = game.factories[action.source, TROOPS]
+            for p in [0.3, 0.9]:
+                if int(source_troops * p) > 0:
+                    candidates.append(Move(action.source, action.destination, int(source_troops * p)))
+                    owners.append(i)
         else:
-            init_eval = time()
-            value = criterion(action, game)
-            # print(f"Move evaluated in {(time() - init_eval) * 1e3}ms", file=sys.stderr, flush=True)
-            if value > best_value:
-                best_value = value
-                best_action = action.cyborg_count
+            candidates.append(action)
+            owners.append(i)
 
-    action.cyborg_count = best_action
-    # print(f"Move optimized in {(time() - init_opt) * 1e3}ms", file=sys.stderr, flush=True)
-    return best_value
+    batch_criterion = BATCH_CRITERIA.get(criterion)
+    if batch_criterion is not None:
+        values = batch_criterion(candidates, game) if len(candidates) > 0 else list()
+    else:
+        values = [criterion(candidate, game) for candidate in candidates]
+
+    best_values = [-10000 if isinstance(action, Move) else None for action in actions]
+    for i, candidate, value in zip(owners, candidates, values):
+        if not isinstance(actions[i], Move):
+            best_values[i] = value
+        elif value > best_values[i]:
+            best_values[i] = value
+            actions[i].cyborg_count = candidate.cyborg_count
+    return best_values
 
 
 def do_not_optimize(action, game, criterion):
@@ -284,49 +360,90 @@ def do_not_optimize(action, game, criterion):
     return value
 
 
-def evaluate_with_states(action, game, n_steps=4, penalty=0.9):
-    # print(f"{action.str}", file=sys.stderr, flush=True)
-    delta_prod, delta_troops = np.zeros((n_steps + 1,)), np.zeros((n_steps + 1,))
+def lookahead(game, actions, n_steps=4):
+    # Steps one copy of the game per action, all stacked on a first axis: each copy plays its action on the first
+    # turn and waits afterwards, as Game.next_state would. Returns the production and troop differences between
+    # the two players before and after every step, one row per action
+    n_actions = len(actions)
+    factories = np.repeat(game.factories[None, :, :], n_actions, axis=0)
+    # Every copy shares the head of the game troop timeline, so the stacked buffers advance by moving it
+    troops = np.repeat(game.troops.buffer[None, :, :, :], n_actions, axis=0)
+    head, length = game.troops.head, troops.shape[2]
+    delta_prod, delta_troops = np.zeros((n_actions, n_steps + 1)), np.zeros((n_actions, n_steps + 1))
+    delta_prod[:, 0] = game.player_production[1] - game.player_production[-1]
+    delta_troops[:, 0] = game.player_troops[1] - game.player_troops[-1]
+
+    moves = np.array([(k, a.source, a.destination, a.cyborg_count) for k, a in enumerate(actions)
+                      if isinstance(a, Move)], dtype=int).reshape((-1, 4))
+    increments = np.array([(k, a.factory) for k, a in enumerate(actions) if isinstance(a, IncreaseProd)],
+                          dtype=int).reshape((-1, 2))
+    for step in range(1, n_steps + 1):
+        head = (head + 1) % length
+        if step == 1:
+            k, source, destination, cyborg_count = moves.T
+            factories[k, source, TROOPS] -= cyborg_count
+            eta = game.distance_matrix[source, destination]
+            troops[k, destination, (head + eta) % length, PLAYER_MAP[1]] += cyborg_count
+            k, factory = increments.T
+            factories[k, factory, PROD] += 1
+            factories[k, factory, TROOPS] -= 10
+
+        owned = factories[:, :, PLAYER] != 0
+        factories[:, :, TROOPS] += np.where(owned & (factories[:, :, BLOCKED] == 0), factories[:, :, PROD], 0)
+
+        troop_balance = troops[:, :, head, PLAYER_MAP[1]] - troops[:, :, head, PLAYER_MAP[-1]]
+        incoming, attack_player = abs(troop_balance), np.sign(troop_balance)
+        factory_troops, factory_player = factories[:, :, TROOPS], factories[:, :, PLAYER]
+        outcome_troops = np.where(factory_player == attack_player, factory_troops + incoming, factory_troops - incoming)
+        factories[:, :, PLAYER] = np.where(outcome_troops >= 0, factory_player, attack_player)
+        factories[:, :, TROOPS] = np.abs(outcome_troops)
+        troops[:, :, head] = 0
+
+        production, troop_count = dict(), dict()
+        for player in [-1, 1]:
+            f_player = factories[:, :, PLAYER] == player
+            production[player] = np.sum(factories[:, :, PROD] * f_player, axis=1)
+            troop_count[player] = np.sum(factories[:, :, TROOPS] * f_player, axis=1) + \
+                np.sum(troops[:, :, :, PLAYER_MAP[player]], axis=(1, 2))
+        delta_prod[:, step] = production[1] - production[-1]
+        delta_troops[:, step] = troop_count[1] - troop_count[-1]
+    return delta_prod, delta_troops
+
+
+def evaluate_states(actions, game, n_steps=4, penalty=0.9):
+    delta_prod, delta_troops = lookahead(game, actions, n_steps)
+    # Scored the way evaluate_with_states always has: the first two production entries hold the troop differences
+    # and the first two troop entries are left at 0
+    delta_prod[:, :2] = delta_troops[:, :2]
+    delta_troops[:, :2] = 0
     penalty_vec = np.array([penalty ** i for i in range(n_steps)])
-    game_proj = game.clone()
-    delta_prod[0] = game_proj.player_production[1] - game_proj.player_production[-1]
-    delta_prod[0] = game_proj.player_troops[1] - game_proj.player_troops[-1]
-    game_proj.next_state(action)
-    delta_prod[1] = game_proj.player_production[1] - game_proj.player_production[-1]
-    delta_prod[1] = game_proj.player_troops[1] - game_proj.player_troops[-1]
-    for i in range(2, n_steps + 1):
-        game_proj.next_state(Wait())
-        delta_prod[i] = game_proj.player_production[1] - game_proj.player_production[-1]
-        delta_troops[i] = game_proj.player_troops[1] - game_proj.player_troops[-1]
-    score = (delta_prod[1:] - delta_prod[:-1]) * 10 + (delta_troops[1:] - delta_troops[:-1])
-
-    # print(f"{game.distance_matrix[action.source, action.destination]}", file=sys.stderr, flush=True)
-    # print(f"{delta_prod} {delta_prod[1:] - delta_prod[:-1]}", file=sys.stderr, flush=True)
-    # print(f"{delta_troops}", file=sys.stderr, flush=True)
-    # print(f"{score}", file=sys.stderr, flush=True)
-    score = sum(score * penalty_vec)
-
-    # print(f"Action apply takes      {(end_eval - init_eval) * 1e3}ms", file=sys.stderr, flush=True)
-    # print(f"Game proj takes      {proj_time * 1e3}ms", file=sys.stderr, flush=True)
-    # print(f"Metric compute takes {metric_time * 1e3}ms", file=sys.stderr, flush=True)
-    # print(f"Actio  evaluation takes {(time() - init_eval) * 1e3}ms", file=sys.stderr, flush=True)
-    return score
+    score = ((delta_prod[:, 1:] - delta_prod[:, :-1]) * 10 + (delta_troops[:, 1:] - delta_troops[:, :-1])) * penalty_vec
+    total = np.zeros(len(actions))
+    for i in range(n_steps):
+        total += score[:, i]
+    return total
+
+
+def evaluate_with_states(action, game, n_steps=4, penalty=0.9):
+    return evaluate_states([action], game, n_steps, penalty)[0]
+
+
+@lru_cache(maxsize=None)
+def production_incidence(size):
+    # Minus the count of earlier etas, built once per map size and never written to
+    incidence_prod = np.triu(-np.ones((size, size), dtype=int), k=1)
+    incidence_prod.setflags(write=False)
+    return incidence_prod
 
 
 def heuristic_evaluate(action, game):
     if isinstance(action, Move):
-        distance = game.distance_matrix[action.source, action.destination]
         target_player, target_prod = game.factories[action.destination, PLAYER], game.factories[
             action.destination, PROD]
-        target_troops, target_incoming = game.factories[action.destination, TROOPS], game.factories[
-            action.destination, PROD]
-        prize = target_prod * (target_player != 1)
-        troops_matrix = game.troops.copy()
-        enemy_troops = troops_matrix[action.destination, :, PLAYER_MAP[-1]]
-        ally_troops = troops_matrix[action.destination, :, PLAYER_MAP[1]]
-        incidence = np.triu(np.ones((game.max_distance + 1, game.max_distance + 1), dtype=int))
-        incidence_prod = np.triu(-np.ones((game.max_distance + 1, game.max_distance + 1), dtype=int), k=1)
-        cumul_ally, cumul_enemy = ally_troops.dot(incidence), enemy_troops.dot(incidence)
+        target_troops = game.factories[action.destination, TROOPS]
+        cumul_ally = game.cumulative_troops[action.destination, :, PLAYER_MAP[1]]
+        cumul_enemy = game.cumulative_troops[action.destination, :, PLAYER_MAP[-1]]
+        incidence_prod = production_incidence(game.max_distance + 1)
         player = np.sign(cumul_enemy - cumul_ally + target_troops * (target_player != 1))
         prod_cost = target_prod * (target_player == -1) * player.dot(incidence_prod)
         final = target_troops * (target_player == -1) + cumul_enemy - (cumul_ally + prod_cost) - target_troops * (
@@ -334,6 +451,10 @@ def heuristic_evaluate(action, game):
     return final
 
 
+BATCH_CRITERIA = {evaluate_with_states: evaluate_states}
+BATCH_OPTIMIZERS = {move_optimizer: move_batch_optimizer}
+
+
 class Player:
 
     def __init__(self, player_id, move_action_eval, prod_action_eval, bomb_action_eval):
@@ -354,7 +475,7 @@ class Player:
         print(f"Got available actions in {(time() - init_get_actions) * 1e3}ms", file=sys.stderr, flush=True)
         return action_list
 
-    def get_plan(self, game: Game, time_limit=45):
+    def get_plan(self, game: Game, time_limit=45, sample_size=20):
         init_plan = time()
         plan = list()
         # print(f"N actions {len(action_list)}", file=sys.stderr, flush=True)
@@ -369,11 +490,11 @@ class Player:
             print(f"Cycles {n}", file=sys.stderr, flush=True)
             opt_start = time()
             action_list = [a for a in self.get_actions(game_copy) if a.is_valid(game_copy)]
-            action_sample = np.random.choice(action_list, size=(min(20, len(action_list)),), replace=False)
+            action_sample = np.random.choice(action_list, size=(min(sample_size, len(action_list)),), replace=False)
             action_sample = list(action_sample)
             action_sample.append(Wait())
             # print(f"{action_sample}", file=sys.stderr, flush=True)
-            optimized_values = list(map(lambda x: self.move_action_eval.optimize(x, game_copy), action_sample))
+            optimized_values = self.move_action_eval.optimize_all(action_sample, game_copy)
             a_list = {a.str: v for a, v in zip(action_sample, optimized_values)}
             print(f"Action values : {a_list}", file=sys.stderr, flush=True)
             opt_time = opt_time + time() - opt_start
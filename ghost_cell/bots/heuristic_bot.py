@@ -7,6 +7,17 @@ from time import time
 
 ID, PLAYER, TROOPS, PROD, FROM, TO, SIZE, DIST, BLOCKED = 0, 1, 2, 3, 2, 3, 4, 5, 5
 PLAYER_MAP = {-1: 1, 1: 0}
+WAIT_SCORE = 0.00001
+FACTORY, TROOP, BOMB = 0, 1, 2
+ENTITY_CODES = {"FACTORY": str(FACTORY), "TROOP": str(TROOP), "BOMB": str(BOMB)}
+
+
+def read_entities(input, entity_count):
+    # Reads the whole entity block and converts it at once, entity types are replaced by their code
+    block = " ".join([input() for _ in range(entity_count)])
+    for entity_type, code in ENTITY_CODES.items():
+        block = block.replace(entity_type, code)
+    return np.fromstring(block, dtype=int, sep=" ").reshape((entity_count, 7))
 
 
 class Game:
@@ -42,18 +53,13 @@ class Game:
 
     def current_status(self, input):
         self.entity_count = int(input())  # the number of entities (e.g. factories and troops)
-        for i in range(self.entity_count):
-            inputs = input().split()
-            entity_id, entity_type = int(inputs[0]), inputs[1]
-            arg_1, arg_2, arg_3, arg_4, arg_5 = int(inputs[2]), int(inputs[3]), int(inputs[4]), int(inputs[5]), int(
-                inputs[6])
-            if entity_type == "FACTORY":
-                self.update_factory(entity_id, player=arg_1, troops=arg_2, prod=arg_3, blocked=arg_4)
-            elif entity_type == "TROOP":
-                self.update_troop(entity_id, player=arg_1, source=arg_2, destination=arg_3, troops=arg_4,
-                                  distance=arg_5)
-            elif entity_type == "BOMB":
-                self.update_bomb(entity_id, player=arg_1, source=arg_2, destination=arg_3, distance=arg_4)
+        entities = read_entities(input, self.entity_count)
+        factories = entities[entities[:, 1] == FACTORY]
+        self.factories[np.ix_(factories[:, 0], [ID, PLAYER, TROOPS, PROD, BLOCKED])] = factories[:, [0, 2, 3, 4, 5]]
+        troops = entities[entities[:, 1] == TROOP]
+        np.add.at(self.troops, (troops[:, 4], troops[:, 6], (troops[:, 2] == -1).astype(int)), troops[:, 5])
+        for entity_id, _, player, source, destination, arg_4, _ in entities[entities[:, 1] == BOMB].tolist():
+            self.update_bomb(entity_id, player=player, source=source, destination=destination, distance=arg_4)
         self.update_stats()
 
     def clone(self):
@@ -261,48 +267,114 @@ def evaluate_move(source, destination, game):
     return min(required_troops, available_troops), roi * (available_troops>required_troops)
 
 
+def discounted_production(max_prod=3):
+    # sum(source_prod * discount) of evaluate_move for every production rate, summed in the same order
+    discounted = list()
+    for prod in range(max_prod + 1):
+        discounted.append(0)
+        for discount in [0.9 ** i for i in range(5)]:
+            discounted[prod] = discounted[prod] + float(prod) * discount
+    return np.array(discounted)
+
+
+DISCOUNTED_PROD = discounted_production()
+
+
+def available_troops(sources, game):
+    # The available troops of evaluate_move for several sources, with the same floats
+    source_troops = game.factories[sources, TROOPS]
+    source_incoming = game.troops[sources, :5, :].sum(axis=1)
+    available = DISCOUNTED_PROD[game.factories[sources, PROD].astype(int)] + source_troops + \
+        source_incoming[:, PLAYER_MAP[1]] - source_incoming[:, PLAYER_MAP[-1]]
+    return np.minimum(np.maximum(available, 0), source_troops)
+
+
+def evaluate_incs(sources, game):
+    return (game.factories[sources, PROD] + 1) / 10. * (available_troops(sources, game) > 10.)
+
+
+def evaluate_moves(sources, destinations, game):
+    # evaluate_move for every source x destination pair at once
+    distance = game.distance_matrix[np.ix_(sources, destinations)]
+    available = available_troops(sources, game)[:, None]
+    cumul_incoming = np.cumsum(game.troops[destinations, :, :], axis=1)
+    columns = np.arange(len(destinations))[None, :]
+    enemy_incoming = cumul_incoming[columns, distance, PLAYER_MAP[-1]]
+    ally_incoming = cumul_incoming[columns, distance, PLAYER_MAP[1]]
+
+    target_player = game.factories[destinations, PLAYER][None, :]
+    target_prod = game.factories[destinations, PROD][None, :]
+    target_troops = game.factories[destinations, TROOPS][None, :]
+    gain = target_prod + 0.1
+    # Neutral targets add a 0. production cost, which leaves the floats unchanged
+    prod_cost = target_prod * distance * (target_player == -1)
+    required_troops = np.maximum(np.where(target_player == 1, enemy_incoming - ally_incoming - target_troops,
+                                          target_troops + enemy_incoming + prod_cost - ally_incoming + 1), 0)
+    distance_penalty = np.where(target_player == 1, 1e-2, 5e-2)
+    roi = gain / (required_troops + 1e-5) * (required_troops > 0) - distance * distance_penalty
+    return np.where(available < required_troops, available, required_troops), roi * (available > required_troops)
+
+
 class Player:
 
     def __init__(self, player_id):
         self.player_id = player_id
+        self.scores, self.cyborgs = None, None
 
     def get_actions(self, game):
         init_get_actions = time()
         action_list = list()
-        sources = game.factories[game.factories[:, PLAYER] == 1, ID]
-        for source_id in sources:
-            action_list.append((IncreaseProd(int(source_id)), evaluate_inc(int(source_id), game)))
-            for dest_id in game.factories[:, ID]:
-                if source_id != dest_id:
-                    tr, roi = evaluate_move(int(source_id), int(dest_id), game)
-                    if tr > 0:
-                        action_list.append((Move(source_id, dest_id, tr), roi))
+        sources = np.flatnonzero(game.factories[:, PLAYER] == 1)
+        inc_roi = evaluate_incs(sources, game)
+        move_troops, move_roi = evaluate_moves(sources, np.arange(game.factory_count), game)
+        for i, source_id in enumerate(sources):
+            action_list.append((IncreaseProd(source_id), inc_roi[i]))
+            for dest_id in range(game.factory_count):
+                if (source_id != dest_id) & (move_troops[i, dest_id] > 0):
+                    action_list.append((Move(source_id, dest_id, move_troops[i, dest_id]), move_roi[i, dest_id]))
         # wait_list.append(Wait())
-        action_list.append((Wait(), 0.00001))
+        action_list.append((Wait(), WAIT_SCORE))
         #print(f"Got available actions in {(time() - init_get_actions) * 1e3}ms", file=sys.stderr, flush=True)
         return action_list
 
+    def score_actions(self, game, sources):
+        # Column 0 is the production increase, column d + 1 the move to d, invalid actions score -inf
+        destinations = np.arange(game.factory_count)
+        valid_inc = (game.factories[sources, TROOPS] >= 10) & (game.factories[sources, PROD] <= 2)
+        self.scores[sources, 0] = np.where(valid_inc, evaluate_incs(sources, game), -np.inf)
+        move_troops, move_roi = evaluate_moves(sources, destinations, game)
+        valid_move = (move_troops >= 1) & (sources[:, None] != destinations[None, :])
+        self.cyborgs[sources, 1:] = move_troops
+        self.scores[sources, 1:] = np.where(valid_move, move_roi, -np.inf)
+
     def get_plan(self, game: Game, time_limit=45):
-        init_plan = time()
+        # Greedy plan, each step takes the best action as get_actions would list and rank them. Scores are kept in a
+        # sources x (increase, destinations) table in get_actions order, rescored at once after every action. Every
+        # appended action is already applied, so the plan stays valid whenever the deadline stops the planning
+        deadline = time() + time_limit / 1e3
         plan = list()
-        t = (time() - init_plan) * 1e3
-        opt_time = 0
-        n = 0
-        while t < time_limit:
-            opt_start = time()
-            action_list = self.get_actions(game)
-            action_list = [a for a in action_list if a[0].is_valid(game)]
-            #print(f"{sorted([(a.str, _) for a,_ in action_list], key=lambda x: x[1], reverse=True)}", file=sys.stderr, flush=True)
-            best_action, _ = max(action_list, key=lambda x : x[1])
-            if best_action.is_valid(game):
-                plan.append(best_action.str)
-                best_action.apply(game)
-            if isinstance(best_action, Wait):
+        n = game.factory_count
+        sources = np.flatnonzero(game.factories[:, PLAYER] == 1)
+        self.scores, self.cyborgs = np.full((n, n + 1), -np.inf), np.zeros((n, n + 1))
+        while True:
+            self.score_actions(game, sources)
+            if time() > deadline:
+                # An empty answer is an invalid action for the referee
+                if len(plan) == 0:
+                    plan.append(Wait().str)
                 break
-            t = (time() - init_plan) * 1e3
-            #print(f"Time elapsed {t}", file=sys.stderr, flush=True)
-            n = n + 1
-        #print(f"Action optimization takes {opt_time * 1e3}ms", file=sys.stderr, flush=True)
+            # First best in get_actions order, WAIT only wins if strictly better than everything else
+            best = int(np.argmax(self.scores))
+            if self.scores.flat[best] < WAIT_SCORE:
+                plan.append(Wait().str)
+                break
+            source_id, column = divmod(best, n + 1)
+            if column == 0:
+                action = IncreaseProd(source_id)
+            else:
+                action = Move(source_id, column - 1, self.cyborgs[source_id, column])
+            plan.append(action.str)
+            action.apply(game)
         return plan
 
     def execute_plan(self, plan):
@@ -310,27 +382,28 @@ class Player:
         print(";".join(plan))
 
 
-game = Game()
-game.initialize(input)
-agent = Player(player_id=1)
-# game loop
-#print(f"{game.distance_matrix}", file=sys.stderr, flush=True)
-while True:
-    start = time()
-    #print(f"{type(input)} {input}", file=sys.stderr, flush=True)
-    game.current_status(input)
-    #print(f"{game.troops[:, :, PLAYER_MAP[1]]}", file=sys.stderr, flush=True)
-    # Write an action using print
-    # To debug: print("Debug messages...", file=sys.stderr, flush=True)
-    # _delta_move(game, player_priority={0:10, 1:2, -1:20})
-    # Any valid action, such as "WAIT" or "MOVE source destination cyborgs"
-    start_plan = time()
-    action_plan = agent.get_plan(game, time_limit=35)
-    #print(f"Action plan in {(time() - start_plan) * 1e3}ms", file=sys.stderr, flush=True)
-    # print(f"{action_plan}", file=sys.stderr, flush=True)
-    if len(action_plan) == 0:
-        print("WAIT")
-    else:
-        agent.execute_plan(action_plan)
-    game.troops[:, :, :] = 0
-    #print(f"Turn took {(time() - start) * 1e3}ms", file=sys.stderr, flush=True)
\ No newline at end of file
+if __name__ == "__main__":
+    game = Game()
+    game.initialize(input)
+    agent = Player(player_id=1)
+    # game loop
+    #print(f"{game.distance_matrix}", file=sys.stderr, flush=True)
+    while True:
+        start = time()
+        #print(f"{type(input)} {input}", file=sys.stderr, flush=True)
+        game.current_status(input)
+        #print(f"{game.troops[:, :, PLAYER_MAP[1]]}", file=sys.stderr, flush=True)
+        # Write an action using print
+        # To debug: print("Debug messages...", file=sys.stderr, flush=True)
+        # _delta_move(game, player_priority={0:10, 1:2, -1:20})
+        # Any valid action, such as "WAIT" or "MOVE source destination cyborgs"
+        start_plan = time()
+        action_plan = agent.get_plan(game, time_limit=35)
+        #print(f"Action plan in {(time() - start_plan) * 1e3}ms", file=sys.stderr, flush=True)
+        # print(f"{action_plan}", file=sys.stderr, flush=True)
+        if len(action_plan) == 0:
+            print("WAIT")
+        else:
+            agent.execute_plan(action_plan)
+        game.troops[:, :, :] = 0
+        #print(f"Turn took {(time() - start) * 1e3}ms", file=sys.stderr, flush=True)
\ No newline at end of file
@@ -6,6 +6,16 @@ from time import time
 
 ID, PLAYER, TROOPS, PROD, FROM, TO, SIZE, DIST, BLOCKED = 0, 1, 2, 3, 2, 3, 4, 5, 5
 PLAYER_MAP = {-1: 1, 1: 0}
+FACTORY, TROOP, BOMB = 0, 1, 2
+ENTITY_CODES = {"FACTORY": str(FACTORY), "TROOP": str(TROOP), "BOMB": str(BOMB)}
+
+
+def read_entities(input, entity_count):
+    # Reads the whole entity block and converts it at once, entity types are replaced by their code
+    block = " ".join([input() for _ in range(entity_count)])
+    for entity_type, code in ENTITY_CODES.items():
+        block = block.replace(entity_type, code)
+    return np.fromstring(block, dtype=int, sep=" ").reshape((entity_count, 7))
 
 
 def dijkstra(distance_matrix, source, min_distance_matrix, step_matrix, path_tree):
@@ -37,6 +47,81 @@ def dijkstra(distance_matrix, source, min_distance_matrix, step_matrix, path_tre
         step_matrix[source, n] = len(path_tree[(source, n)])
 
 
+def floyd_warshall(distance_matrix):
+    n_node = distance_matrix.shape[0]
+    min_distance_matrix = distance_matrix.copy()
+    for k in range(n_node):
+        via_k = min_distance_matrix[:, k, None] + min_distance_matrix[None, k, :]
+        min_distance_matrix = np.minimum(min_distance_matrix, via_k)
+    # Same predecessor dijkstra keeps: among the nodes u on a shortest path to v, the first one it settles,
+    # that is the lowest (distance from the source, id)
+    reaching = (min_distance_matrix[:, :, None] + distance_matrix[None, :, :] == min_distance_matrix[:, None, :]) & \
+               ~np.eye(n_node, dtype=bool)[None, :, :]
+    settle_order = min_distance_matrix[:, :, None] * n_node + np.arange(n_node)[None, :, None]
+    predecessor = np.argmin(np.where(reaching, settle_order, np.iinfo(int).max), axis=1)
+    sources = np.arange(n_node)[:, None]
+    step_matrix = np.zeros((n_node, n_node), dtype=int)
+    for _ in range(n_node - 1):
+        step_matrix = np.where(predecessor == sources, 1, step_matrix[sources, predecessor] + 1)
+    np.fill_diagonal(step_matrix, 0)
+    return min_distance_matrix, step_matrix, predecessor
+
+
+class PathTree:
+    # path_tree[(source, target)] as dijkstra builds it, rebuilt from the predecessor matrix the first time it is asked
+    def __init__(self, predecessor):
+        self.predecessor = predecessor
+        self.paths = dict()
+
+    def __getitem__(self, key):
+        path = self.paths.get(key)
+        if path is None:
+            source, current = key
+            path = deque()
+            while current != source:
+                previous = int(self.predecessor[source, current])
+                path.appendleft((previous, current))
+                current = previous
+            self.paths[key] = path
+        return path
+
+    def __len__(self):
+        return self.predecessor.shape[0] * (self.predecessor.shape[0] - 1)
+
+
+def min_cost_flow(capacity, cost, deadline=None):
+    # Successive shortest paths from node 0 to the last node, pushed as long as they lower the total cost.
+    # Bellman-Ford relaxes every residual arc at once, arcs only go one way so a reverse arc costs -cost.
+    # Returns None once the deadline is passed
+    n_node = capacity.shape[0]
+    sink, nodes = n_node - 1, np.arange(n_node)
+    arc_cost = cost - cost.T
+    residual = capacity.copy()
+    while (deadline is None) or (time() < deadline):
+        weights = np.where(residual > 0, arc_cost, np.inf)
+        dist, parent = np.full(n_node, np.inf), np.full(n_node, -1)
+        dist[0] = 0
+        for _ in range(n_node - 1):
+            reach = dist[:, None] + weights
+            best = np.argmin(reach, axis=0)
+            candidate = reach[best, nodes]
+            improved = candidate < dist
+            if not np.any(improved):
+                break
+            dist[improved], parent[improved] = candidate[improved], best[improved]
+        if not dist[sink] < 0:
+            return np.maximum(capacity - residual, 0)
+        path, current = list(), sink
+        while current != 0:
+            path.append((parent[current], current))
+            current = parent[current]
+        pushed = min(residual[u, v] for u, v in path)
+        for u, v in path:
+            residual[u, v] -= pushed
+            residual[v, u] += pushed
+    return None
+
+
 class GameState:
     def __init__(self):
         self.player_production = {0: 0, 1: 0, -1: 0}
@@ -54,11 +139,8 @@ class GameState:
         self.troops = np.zeros((self.factory_count, self.max_distance + 1, 2), dtype=int)
         self.bombs = dict()
 
-        self.path_tree = dict()
-        self.min_distance_matrix = np.zeros((self.factory_count, self.factory_count), dtype=int)
-        self.step_matrix = np.zeros((self.factory_count, self.factory_count), dtype=int)
-        for source in range(self.factory_count):
-            dijkstra(self.distance_matrix, source, self.min_distance_matrix, self.step_matrix, self.path_tree)
+        self.min_distance_matrix, self.step_matrix, predecessor = floyd_warshall(self.distance_matrix)
+        self.path_tree = PathTree(predecessor)
 
     def update_factory(self, entity_id, player, troops, prod, blocked):
         self.factories[entity_id, ID] = entity_id
@@ -77,37 +159,60 @@ class GameState:
     def current_status(self, input):
         self.troops[:, :, :] = 0
         self.entity_count = int(input())  # the number of entities (e.g. factories and troops)
-        for i in range(self.entity_count):
-            inputs = input().split()
-            entity_id, entity_type = int(inputs[0]), inputs[1]
-            arg_1, arg_2, arg_3, arg_4, arg_5 = int(inputs[2]), int(inputs[3]), int(inputs[4]), int(inputs[5]), int(
-                inputs[6])
-            if entity_type == "FACTORY":
-                self.update_factory(entity_id, player=arg_1, troops=arg_2, prod=arg_3, blocked=arg_4)
-            elif entity_type == "TROOP":
-                self.update_troop(entity_id, player=arg_1, source=arg_2, destination=arg_3, troops=arg_4,
-                                  distance=arg_5)
-            elif entity_type == "BOMB":
-                self.update_bomb(entity_id, player=arg_1, source=arg_2, destination=arg_3, countdown=arg_4)
+        entities = read_entities(input, self.entity_count)
+        factories = entities[entities[:, 1] == FACTORY]
+        self.factories[np.ix_(factories[:, 0], [ID, PLAYER, TROOPS, PROD, BLOCKED])] = factories[:, [0, 2, 3, 4, 5]]
+        troops = entities[entities[:, 1] == TROOP]
+        np.add.at(self.troops, (troops[:, 4], troops[:, 6], (troops[:, 2] == -1).astype(int)), troops[:, 5])
+        for entity_id, _, player, source, destination, arg_4, _ in entities[entities[:, 1] == BOMB].tolist():
+            self.update_bomb(entity_id, player=player, source=source, destination=destination, countdown=arg_4)
 
     def reset(self):
         self.troops[:, :, :] = 0
         self.bombs = dict()
 
 
+def read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+class Workspace:
+    # Per game buffers every turn is computed into, so the think loop does not allocate them again
+    def __init__(self, factory_count, n_eta):
+        self.my_factories = np.zeros(factory_count, dtype=bool)
+        self.enemy_factories = np.zeros(factory_count, dtype=bool)
+        self.mask = np.zeros(factory_count, dtype=bool)
+        self.prod_unblocked = np.zeros(factory_count)
+        self.vector = np.zeros(factory_count)
+        self.weighted_troops = np.zeros((factory_count, n_eta))
+        self.weighted_factories = np.zeros((factory_count, factory_count))
+        self.moving_troops_costs = np.zeros(factory_count)
+        self.stationing_troops_costs = np.zeros(factory_count)
+        self.costs = np.zeros(factory_count)
+        self.prod_penalty_matrix = np.zeros((factory_count, factory_count))
+        self.troops_required = np.zeros((factory_count, 1))
+        self.troops_required_matrix = np.zeros((factory_count, factory_count))
+        self.troops_reserve = np.zeros((factory_count, 1))
+
+
 class Player:
 
     def __init__(self, player_id: int, moving_troop_dist_th: int, moving_troop_discount: float,
-                 stationing_troop_dist_th: int, stationing_troop_discount: float, factory_value_penalty=0.9):
+                 stationing_troop_dist_th: int, stationing_troop_discount: float, factory_value_penalty=0.9,
+                 allocator="greedy", flow_time_limit=10):
         self.moving_troop_dist_th = moving_troop_dist_th
         self.moving_troop_discount = moving_troop_discount
         self.stationing_troop_dist_th = stationing_troop_dist_th
         self.stationing_troop_discount = stationing_troop_discount
         self.factory_value_penalty = factory_value_penalty
+        # "greedy" or "flow", flow_time_limit in ms before the flow allocator gives up and falls back to greedy
+        self.allocator = allocator
+        self.flow_time_limit = flow_time_limit
         self.action_list = list()
         self.player_id = player_id
 
-        self.state = None
+        self.state, self.map_state = None, None
         self.my_factories, self.enemy_factories, self.total_prod = None, None, 0
         self.prod_penalty_matrix = None
         self.bomb_state = dict()
@@ -139,34 +244,89 @@ class Player:
             available_troops = troops - factory_cost - max(troop_cost, 0)
             return available_troops * (available_troops > 0)
 
-    def _compute_distance_penalty_matrix(self):
-        self.distance_penalty_matrix = np.power(np.array(self.moving_troop_discount),
-                                                np.maximum(self.state.distance_matrix - 1, 0))
+    def initialize(self, game_state: GameState):
+        # Tables depending only on the map and the hyperparameters, built once per game and never written to
+        self.map_state = game_state
+        distance_matrix = game_state.distance_matrix
+        self.moving_troop_dist_th = min(self.moving_troop_dist_th, game_state.max_distance)
+        self.stationing_troop_dist_th = min(self.stationing_troop_dist_th, game_state.max_distance)
+        self.distance_penalty_matrix = read_only(np.power(np.array(self.moving_troop_discount),
+                                                          np.maximum(distance_matrix - 1, 0)))
+        self.troop_discount = read_only(np.array([self.moving_troop_discount ** i
+                                                  for i in range(self.moving_troop_dist_th + 1)]))
+        factory_discount = np.array([self.stationing_troop_discount ** d for d in np.arange(np.max(distance_matrix) + 1)])
+        self.stationing_discount_matrix = read_only(factory_discount[np.maximum(distance_matrix, 0)])
+        self.stationing_nearby = read_only((distance_matrix <= self.stationing_troop_dist_th) &
+                                           ~np.eye(game_state.factory_count, dtype=bool))
+        self.neighbour_order = read_only(np.argsort(distance_matrix, axis=1))
+        self.source_order = read_only(np.argsort(game_state.min_distance_matrix, axis=0))
+        self.path_length = read_only(game_state.min_distance_matrix + game_state.step_matrix - 1)
+        self.workspace = Workspace(game_state.factory_count, self.moving_troop_dist_th + 1)
 
     def _compute_prod_penalty_matrix(self):
-        prod_vec = self.state.factories[:, PROD] * (self.state.factories[:, BLOCKED] == 0) * self.enemy_factories
-        self.prod_penalty_matrix = (self.state.min_distance_matrix + self.state.step_matrix - 1) * prod_vec[None, :]
+        prod_vec = np.multiply(self.workspace.prod_unblocked, self.enemy_factories, out=self.workspace.vector)
+        self.prod_penalty_matrix = np.multiply(self.path_length, prod_vec[None, :],
+                                               out=self.workspace.prod_penalty_matrix)
+
+    def _moving_troops_costs(self):
+        incoming_enemy = self.state.troops[:, :self.moving_troop_dist_th + 1, PLAYER_MAP[-self.player_id]]
+        incoming_ally = self.state.troops[:, :self.moving_troop_dist_th + 1, PLAYER_MAP[self.player_id]]
+        weighted = np.subtract(incoming_enemy, incoming_ally, out=self.workspace.weighted_troops)
+        weighted *= self.troop_discount
+        # Added one eta after the other, the order _moving_troops_cost sums them, so the costs match to the last bit
+        costs = self.workspace.moving_troops_costs
+        costs[:] = 0
+        for eta in range(weighted.shape[1]):
+            costs += weighted[:, eta]
+        return costs
+
+    def _stationing_troops_costs(self):
+        weighted = np.multiply(self.state.factories[None, :, TROOPS], self.stationing_discount_matrix,
+                               out=self.workspace.weighted_factories)
+        weighted *= self.stationing_nearby
+        costs = self.workspace.stationing_troops_costs
+        costs[:] = 0
+        for enemy_id in np.flatnonzero(self.enemy_factories):
+            costs += weighted[:, enemy_id]
+        return costs
 
     def _compute_troops_required(self):
-
-        troops_required = np.array([
-            [self._required_troops_factory(factory_id) for factory_id in self.state.factories[:, ID]]]).T
-        troops_required = np.ceil(troops_required)
-
-        self.total_troops_required = sum(troops_required)
-
-        self.troops_required_matrix = np.dot(troops_required, self.matrix_converter).T
-        self.troops_required_matrix = self.prod_penalty_matrix + self.troops_required_matrix
+        ws = self.workspace
+        troops = self.state.factories[:, TROOPS]
+        costs = np.add(self.moving_troops_costs, self.stationing_troops_costs, out=ws.costs)
+        # Neutral factories, then the enemy and my own ones written over them
+        required_to_take = ws.troops_required[:, 0]
+        np.add(costs, troops, out=required_to_take)
+        required_to_take += 1
+        np.add(required_to_take, ws.prod_unblocked, out=ws.vector)
+        np.copyto(required_to_take, ws.vector, where=self.enemy_factories)
+        np.subtract(costs, troops, out=ws.vector)
+        ws.vector -= ws.prod_unblocked
+        np.copyto(required_to_take, ws.vector, where=self.my_factories)
+        np.greater(required_to_take, 0, out=ws.mask)
+        np.abs(required_to_take, out=required_to_take)
+        required_to_take *= ws.mask
+        np.ceil(required_to_take, out=required_to_take)
+
+        self.total_troops_required = sum(ws.troops_required)
+
+        self.troops_required_matrix = np.add(self.prod_penalty_matrix, ws.troops_required.T,
+                                             out=ws.troops_required_matrix)
 
     def _compute_troops_reserve(self):
-
-        troops_reserve = np.array([
-            [self._available_troops_factory(factory_id) for factory_id in self.state.factories[:, ID]]]).T
-        troops_reserve = np.floor(abs(troops_reserve) * (troops_reserve > 0))
-
-        # self.total_capacity = sum(troops_reserve)
-        self.troops_reserve_vector = troops_reserve
-        # self.troops_reserve_matrix = np.dot(troops_reserve, self.matrix_converter)
+        ws = self.workspace
+        troops_reserve = ws.troops_reserve[:, 0]
+        np.subtract(self.state.factories[:, TROOPS], self.stationing_troops_costs, out=troops_reserve)
+        troops_reserve -= np.maximum(self.moving_troops_costs, 0, out=ws.vector)
+        np.greater(troops_reserve, 0, out=ws.mask)
+        troops_reserve *= ws.mask
+        troops_reserve *= self.my_factories
+        np.greater(troops_reserve, 0, out=ws.mask)
+        np.abs(troops_reserve, out=troops_reserve)
+        troops_reserve *= ws.mask
+        np.floor(troops_reserve, out=troops_reserve)
+
+        self.troops_reserve_vector = ws.troops_reserve
 
     def _required_troops_factory(self, factory_id):
         player = self.state.factories[factory_id, PLAYER]
@@ -188,7 +348,7 @@ class Player:
         k_neighbors = min(k, sum(self.my_factories), sum(self.enemy_factories))
         k_ally, k_enemy = 0, 0
         sum_distance_ally, sum_distance_enemy = 0, 0
-        for fid in np.argsort(self.state.distance_matrix[factory_id, :]):
+        for fid in self.neighbour_order[factory_id]:
             if fid == factory_id:
                 continue
             elif (k_ally == k_neighbors) & (k_enemy == k_neighbors):
@@ -255,8 +415,7 @@ class Player:
                     self.action_list.append(f"INC {evacuate}")
                     troops -= 10
                     increments -= 1
-                refugee = np.argsort(self.state.distance_matrix[evacuate, :])
-                for fid in refugee:
+                for fid in self.neighbour_order[evacuate]:
                     if self.my_factories[fid] & (fid != evacuate):
                         self.action_list.append(f"MOVE {evacuate} {fid} {troops + prod}")
                         break
@@ -277,7 +436,7 @@ class Player:
         for target_id in ordered_targets:
             max_troops_required = max_required_target[target_id]
             if max_troops_required <= sum(self.troops_reserve_vector):
-                ordered_sources = np.argsort(self.state.min_distance_matrix[:, target_id])
+                ordered_sources = self.source_order[:, target_id]
                 to_consider = (self.my_factories[ordered_sources]) & (ordered_sources != target_id) & \
                               (self.troops_reserve_vector[ordered_sources].reshape((-1,)) >= 1)
                 ordered_sources = ordered_sources[to_consider]
@@ -303,6 +462,55 @@ class Player:
                     if (committed >= required_from_source) | (committed > max_troops_required):
                         break
 
+    def _flow_allocation(self, deadline):
+        # Dispatch as a min-cost flow: reserves flow from my factories to the prioritized targets, a target earns
+        # more than any path length so higher priorities are served first, and distance decides which source goes.
+        # A partially served target would waste its troops, the lowest priority one is dropped and the flow solved again
+        ordered_targets, max_required_target = self._prioritize_target()
+        reserve = self.troops_reserve_vector.reshape((-1,))
+        targets = ordered_targets[max_required_target[ordered_targets] <= sum(reserve)]
+        sources = np.flatnonzero(self.my_factories & (reserve >= 1))
+        n_source, n_target = len(sources), len(targets)
+        if (n_source == 0) | (n_target == 0):
+            return list()
+        demand = max_required_target[targets].astype(int)
+        target_nodes, sink = np.arange(n_target) + n_source + 1, n_source + n_target + 1
+        capacity = np.zeros((sink + 1, sink + 1), dtype=int)
+        cost = np.zeros((sink + 1, sink + 1))
+        capacity[0, 1:n_source + 1] = reserve[sources]
+        capacity[1:n_source + 1, target_nodes] = np.sum(reserve) * (sources[:, None] != targets[None, :])
+        cost[1:n_source + 1, target_nodes] = self.state.min_distance_matrix[sources[:, None], targets[None, :]]
+        capacity[target_nodes, sink] = demand
+        cost[target_nodes, sink] = -(n_target - np.arange(n_target)) * (np.max(self.state.min_distance_matrix) + 1)
+        while True:
+            flow = min_cost_flow(capacity, cost, deadline)
+            if flow is None:
+                return None
+            served = flow[target_nodes, sink]
+            partial = np.flatnonzero((served > 0) & (served < demand))
+            if len(partial) == 0:
+                break
+            capacity[target_nodes[partial[-1]], sink] = 0
+        source_nodes = np.zeros(self.state.factory_count, dtype=int)
+        source_nodes[sources] = np.arange(n_source) + 1
+        moves = list()
+        for target_node, target_id in zip(target_nodes, targets):
+            for source_id in self.source_order[:, target_id]:
+                n_cyborgs = flow[source_nodes[source_id], target_node] if source_nodes[source_id] > 0 else 0
+                if n_cyborgs > 0:
+                    moves.append((source_id, target_id, int(n_cyborgs)))
+        return moves
+
+    def select_flow_move(self):
+        moves = self._flow_allocation(time() + self.flow_time_limit / 1000)
+        if moves is None:
+            self.select_move()
+            return
+        for source_id, target_id, n_cyborgs in moves:
+            first_target = self.state.path_tree[(source_id, target_id)][0][1]
+            self.action_list.append(f"MOVE {source_id} {first_target} {n_cyborgs}")
+            self._update_from_move(source_id, first_target, n_cyborgs)
+
     def select_increments(self):
         if sum(self.troops_reserve_vector) < 10:
             return
@@ -315,12 +523,14 @@ class Player:
                 self._update_after_increment(source_id)
 
     def _update_from_state(self, game_state: GameState):
+        if self.map_state is not game_state:
+            self.initialize(game_state)
         self.state = game_state
-        self.matrix_converter = np.ones((1, self.state.factory_count))
-        self.my_factories = self.state.factories[:, PLAYER] == self.player_id
-        self.enemy_factories = self.state.factories[:, PLAYER] == -self.player_id
-        self.moving_troop_dist_th = min(self.moving_troop_dist_th, self.state.max_distance)
-        self.stationing_troop_dist_th = min(self.stationing_troop_dist_th, self.state.max_distance)
+        ws = self.workspace
+        self.my_factories = np.equal(self.state.factories[:, PLAYER], self.player_id, out=ws.my_factories)
+        self.enemy_factories = np.equal(self.state.factories[:, PLAYER], -self.player_id, out=ws.enemy_factories)
+        np.multiply(self.state.factories[:, PROD], np.equal(self.state.factories[:, BLOCKED], 0, out=ws.mask),
+                    out=ws.prod_unblocked)
         self.total_prod = sum(game_state.factories[self.my_factories, PROD])
 
         self.troops_vector = self.state.factories[:, TROOPS]
@@ -329,16 +539,20 @@ class Player:
         self.total_enemy_troops = sum(self.state.factories[self.enemy_factories, TROOPS])
         self.total_enemy_troops += np.sum(self.state.troops[:, :, PLAYER_MAP[-self.player_id]])
 
-        self._compute_distance_penalty_matrix()
         self._compute_prod_penalty_matrix()
+        self.moving_troops_costs, self.stationing_troops_costs = self._moving_troops_costs(), \
+            self._stationing_troops_costs()
         self._compute_troops_required()
         self._compute_troops_reserve()
 
     def _update_from_move(self, source_id: int, target_id: int, n_cyborgs: int):
         self.troops_reserve_vector[source_id] -= n_cyborgs
         self.troops_vector[source_id] -= n_cyborgs
-        self.troops_required_matrix[:, target_id] -= n_cyborgs
-        self.troops_required_matrix = np.floor(self.troops_required_matrix) * (self.troops_required_matrix > 0)
+        # Requirements are whole numbers, only the target column can drop below zero
+        required = self.troops_required_matrix[:, target_id]
+        required -= n_cyborgs
+        np.floor(required, out=required)
+        required *= np.greater(required, 0, out=self.workspace.mask)
 
     def _update_after_increment(self, factory_id):
         self.troops_reserve_vector[factory_id] -= 10
@@ -346,7 +560,10 @@ class Player:
 
     def select_plan(self):
         self.select_increments()
-        self.select_move()
+        if self.allocator == "flow":
+            self.select_flow_move()
+        else:
+            self.select_move()
         self.predict_bomb()
         if len(self.action_list) == 0:
             self.action_list.append("WAIT")
@@ -363,6 +580,7 @@ if __name__ == "__main__":
     game.initialize(input)
     agent = Player(player_id=1, moving_troop_dist_th=5, moving_troop_discount=1., stationing_troop_dist_th=3,
                    stationing_troop_discount=0.7)
+    agent.initialize(game)
     # game loop
     while True:
         start = time()
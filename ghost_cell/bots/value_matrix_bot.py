@@ -5,6 +5,17 @@ from time import time
 
 ID, PLAYER, TROOPS, PROD, FROM, TO, SIZE, DIST, BLOCKED = 0, 1, 2, 3, 2, 3, 4, 5, 5
 PLAYER_MAP = {-1: 1, 1: 0}
+FACTORY, TROOP, BOMB = 0, 1, 2
+ENTITY_CODES = {"FACTORY": str(FACTORY), "TROOP": str(TROOP), "BOMB": str(BOMB)}
+
+
+def read_entities(input, entity_count):
+    # Reads the whole entity block and converts it at once, entity types are replaced by their code
+    block = " ".join([input() for _ in range(entity_count)])
+    for entity_type, code in ENTITY_CODES.items():
+        block = block.replace(entity_type, code)
+    return np.fromstring(block, dtype=int, sep=" ").reshape((entity_count, 7))
+
 
 class GameState:
     def __init__(self):
@@ -40,18 +51,18 @@ class GameState:
     def current_status(self, input):
         self.troops[:, :, :] = 0
         self.entity_count = int(input())  # the number of entities (e.g. factories and troops)
-        for i in range(self.entity_count):
-            inputs = input().split()
-            entity_id, entity_type = int(inputs[0]), inputs[1]
-            arg_1, arg_2, arg_3, arg_4, arg_5 = int(inputs[2]), int(inputs[3]), int(inputs[4]), int(inputs[5]), int(
-                inputs[6])
-            if entity_type == "FACTORY":
-                self.update_factory(entity_id, player=arg_1, troops=arg_2, prod=arg_3, blocked=arg_4)
-            elif entity_type == "TROOP":
-                self.update_troop(entity_id, player=arg_1, source=arg_2, destination=arg_3, troops=arg_4,
-                                  distance=arg_5)
-            elif entity_type == "BOMB":
-                self.update_bomb(entity_id, player=arg_1, source=arg_2, destination=arg_3, distance=arg_4)
+        entities = read_entities(input, self.entity_count)
+        factories = entities[entities[:, 1] == FACTORY]
+        self.factories[np.ix_(factories[:, 0], [ID, PLAYER, TROOPS, PROD, BLOCKED])] = factories[:, [0, 2, 3, 4, 5]]
+        troops = entities[entities[:, 1] == TROOP]
+        np.add.at(self.troops, (troops[:, 4], troops[:, 6], (troops[:, 2] == -1).astype(int)), troops[:, 5])
+        for entity_id, _, player, source, destination, arg_4, _ in entities[entities[:, 1] == BOMB].tolist():
+            self.update_bomb(entity_id, player=player, source=source, destination=destination, distance=arg_4)
+
+
+def read_only(array):
+    array.setflags(write=False)
+    return array
 
 
 class Player:
@@ -66,20 +77,32 @@ class Player:
         self.action_list = list()
         self.player_id = player_id
 
-        self.state = None
+        self.state, self.map_state = None, None
         self.my_factories, self.enemy_factories, self.total_prod = None, None, 0
         self.prod_penalty_matrix = None
 
+    def initialize(self, game_state: GameState):
+        # Tables depending only on the map and the hyperparameters, built once per game and never written to
+        self.map_state = game_state
+        distance_matrix = game_state.distance_matrix
+        self.moving_troop_dist_th = min(self.moving_troop_dist_th, game_state.max_distance)
+        self.stationing_troop_dist_th = min(self.stationing_troop_dist_th, game_state.max_distance)
+        self.matrix_converter = read_only(np.ones((1, game_state.factory_count)))
+        self.distance_penalty_matrix = read_only(np.power(np.array(self.moving_troop_discount),
+                                                          np.maximum(distance_matrix - 1, 0)))
+        self.troop_discount = read_only(np.array([self.moving_troop_discount ** i
+                                                  for i in range(self.moving_troop_dist_th + 1)]))
+        factory_discount = np.array([self.stationing_troop_discount ** d for d in np.arange(np.max(distance_matrix) + 1)])
+        self.stationing_discount_matrix = read_only(factory_discount[np.maximum(distance_matrix, 0)])
+
     def _update_from_state(self, game_state: GameState):
+        if self.map_state is not game_state:
+            self.initialize(game_state)
         self.state = game_state
-        self.matrix_converter = np.ones((1, self.state.factory_count))
         self.my_factories = self.state.factories[:, PLAYER] == self.player_id
         self.enemy_factories = self.state.factories[:, PLAYER] == -self.player_id
-        self.moving_troop_dist_th = min(self.moving_troop_dist_th, self.state.max_distance)
-        self.stationing_troop_dist_th = min(self.stationing_troop_dist_th, self.state.max_distance)
         self.total_prod = sum(game_state.factories[self.my_factories, PROD])
 
-        self._compute_distance_penalty_matrix()
         self._compute_target_value_matrix()
         self._compute_prod_penalty_matrix()
         self._compute_troops_required()
@@ -88,33 +111,45 @@ class Player:
         required_move = self.troops_required_matrix > 0
         self.troops_ratio_matrix = self.troops_reserve_matrix / (self.troops_required_matrix + 1e-6) * required_move
         self.move_value_matrix = required_move * self.target_value_matrix * self.distance_penalty_matrix * self.troops_ratio_matrix
+        self.move_value_sums = np.sum(self.move_value_matrix, axis=0)
+        self.troops_required_sum = np.sum(self.troops_required_matrix)
+
+    def _update_move_values(self, index):
+        required = self.troops_required_matrix[index]
+        required_move = required > 0
+        ratio = self.troops_reserve_matrix[index] / (required + 1e-6) * required_move
+        self.troops_ratio_matrix[index] = ratio
+        values = required_move * self.target_value_matrix[index] * self.distance_penalty_matrix[index] * ratio
+        self.move_value_matrix[index] = values
+        return values
 
     def _update_from_move(self, source_id: int, target_id: int, n_cyborgs: int):
+        # A move only changes the source reserve row and the target requirement column
         self.total_capacity -= n_cyborgs
 
         self.troops_reserve_vector[source_id] -= n_cyborgs
         self.troops_reserve_matrix[source_id, :] -= n_cyborgs
-        self.troops_required_matrix[:, target_id] -= n_cyborgs
-        self.troops_required_matrix = np.floor(self.troops_required_matrix) * (self.troops_required_matrix > 0)
-        self.total_troops_required = np.sum(self.troops_required_matrix)
-        required_move = self.troops_required_matrix > 0
-        old_troops_ratio_matrix = self.troops_ratio_matrix.copy()
-        self.troops_ratio_matrix = self.troops_reserve_matrix / (self.troops_required_matrix + 1e-6)
-        self.move_value_matrix *= self.troops_ratio_matrix / (old_troops_ratio_matrix + 1e-6) * required_move
+        required = self.troops_required_matrix[:, target_id]
+        required_sum = required.sum()
+        required -= n_cyborgs
+        required *= required > 0
+        self.troops_required_sum += required.sum() - required_sum
+        self.total_troops_required = self.troops_required_sum
 
+        self.move_value_sums -= self.move_value_matrix[source_id, :]
+        self.move_value_sums += self._update_move_values((source_id, slice(None)))
+        self.move_value_sums[target_id] = self._update_move_values((slice(None), target_id)).sum()
 
     def _moving_troops_cost(self, factory_id: int):
-        troop_discount = np.array([self.moving_troop_discount ** i for i in range(self.moving_troop_dist_th + 1)])
         incoming_enemy = self.state.troops[factory_id, :self.moving_troop_dist_th + 1, PLAYER_MAP[-self.player_id]]
         incoming_ally = self.state.troops[factory_id, :self.moving_troop_dist_th + 1, PLAYER_MAP[self.player_id]]
-        return sum((incoming_enemy - incoming_ally) * troop_discount)
+        return sum((incoming_enemy - incoming_ally) * self.troop_discount)
 
     def _stationing_troops_cost(self, factory_id: int):
         enemy_factories_nearby = (self.state.factories[:, PLAYER] == -self.player_id) & \
                                  (self.state.factories[:, ID] != factory_id) &\
                                  (self.state.distance_matrix[factory_id, :] <= self.stationing_troop_dist_th)
-        factory_discount = [self.stationing_troop_discount ** max(d, 0)
-                            for d in self.state.distance_matrix[factory_id, enemy_factories_nearby]]
+        factory_discount = self.stationing_discount_matrix[factory_id, enemy_factories_nearby]
 
         nearby_enemy = self.state.factories[enemy_factories_nearby, TROOPS]
         return sum(nearby_enemy * factory_discount)
@@ -131,10 +166,6 @@ class Player:
     def _compute_target_value_matrix(self):
         self.target_value_matrix = np.dot(self._compute_factories_value().reshape(-1, 1), self.matrix_converter).T
 
-    def _compute_distance_penalty_matrix(self):
-        self.distance_penalty_matrix = np.power(np.array(self.moving_troop_discount),
-                                                np.maximum(self.state.distance_matrix-1, 0))
-
     def _compute_prod_penalty_matrix(self):
         prod_vec = self.state.factories[:, PROD] * self.enemy_factories
         self.prod_penalty_matrix = self.state.distance_matrix * prod_vec[None, :]
@@ -185,31 +216,27 @@ class Player:
         return prod * coef + 0.1
 
     def select_move(self):
-        ordered_targets = reversed(np.argsort(np.sum(self.move_value_matrix, axis=0)))
-        for target_id in ordered_targets:
-            total_value = np.sum(self.move_value_matrix)
+        # Targets are visited in the order of their values before any move, the sums kept by the moves only stop early
+        for target_id in reversed(np.argsort(self.move_value_sums)):
+            total_value = sum(self.move_value_sums.tolist())
             if (self.total_capacity <= 0) | (self.total_troops_required <= 0) | (total_value <= 0):
                 return
-            if np.sum(self.move_value_matrix, axis=0)[target_id] == 0:
+            if self.move_value_sums[target_id] == 0:
                 continue
             discount_ratio = self.distance_penalty_matrix[:, target_id] * self.troops_ratio_matrix[:, target_id]
-            if sum(discount_ratio) > 1:
-                ordered_sources = np.array(list(reversed(np.argsort(self.move_value_matrix[:, target_id]))))
+            if sum(discount_ratio.tolist()) > 1:
+                ordered_sources = np.argsort(self.move_value_matrix[:, target_id])[::-1]
                 to_consider = (self.my_factories[ordered_sources]) & (ordered_sources != target_id)
-                ordered_sources = ordered_sources[to_consider]
-                k = 0
                 total_discount_ratio = 0
-                while total_discount_ratio < 1:
-                    source_id = ordered_sources[k]
+                for source_id in ordered_sources[to_consider]:
                     n_cyborgs = int(min(1./discount_ratio[source_id], 1.) * self.troops_reserve_matrix[source_id, target_id])
                     self.action_list.append(f"MOVE {source_id} {target_id} {n_cyborgs}")
                     total_discount_ratio += discount_ratio[source_id]
-                    k += 1
                     self._update_from_move(source_id, target_id, n_cyborgs)
-                    if (self.total_capacity <= 0) | (self.total_troops_required <= 0) | (total_value <= 0):
+                    if (self.total_capacity <= 0) | (self.total_troops_required <= 0):
                         return
-            else:
-                pass
+                    if total_discount_ratio >= 1:
+                        break
 
     def select_increments(self):
         if self.total_capacity < 10:
@@ -239,6 +266,7 @@ if __name__ == "__main__":
     game.initialize(input)
     agent = Player(player_id=1, moving_troop_dist_th=100, moving_troop_discount=0.99, stationing_troop_dist_th=100,
                    stationing_troop_discount=0.7)
+    agent.initialize(game)
     # game loop
     while True:
         start = time()
@@ -7,6 +7,56 @@ from time import time
 
 ID, PLAYER, TROOPS, PROD, FROM, TO, SIZE, DIST, BLOCKED = 0, 1, 2, 3, 2, 3, 4, 5, 5
 PLAYER_MAP = {-1: 1, 1: 0}
+FACTORY, TROOP, BOMB = 0, 1, 2
+ENTITY_CODES = {"FACTORY": str(FACTORY), "TROOP": str(TROOP), "BOMB": str(BOMB)}
+
+
+def read_entities(input, entity_count):
+    # Reads the whole entity block and converts it at once, entity types are replaced by their code
+    block = " ".join([input() for _ in range(entity_count)])
+    for entity_type, code in ENTITY_CODES.items():
+        block = block.replace(entity_type, code)
+    return np.fromstring(block, dtype=int, sep=" ").reshape((entity_count, 7))
+
+
+class TroopTimeline:
+    # Troops on their way, read and written as troops[destination, eta, player]. Etas live in a ring buffer so that
+    # bringing every troop one turn closer only moves the head slot, which holds the troops arriving now
+    def __init__(self, buffer, head=0):
+        self.buffer = buffer
+        self.head = head
+
+    @property
+    def shape(self):
+        return self.buffer.shape
+
+    def slot(self, eta):
+        if isinstance(eta, slice):
+            eta = np.arange(self.buffer.shape[1])[eta]
+        return (eta + self.head) % self.buffer.shape[1]
+
+    def index(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        return key if len(key) < 2 else (key[0], self.slot(key[1])) + key[2:]
+
+    def __getitem__(self, key):
+        return self.buffer[self.index(key)]
+
+    def __setitem__(self, key, value):
+        self.buffer[self.index(key)] = value
+
+    def __array__(self, dtype=None):
+        array = np.roll(self.buffer, -self.head, axis=1)
+        return array if dtype is None else array.astype(dtype)
+
+    def add_at(self, key, values):
+        np.add.at(self.buffer, self.index(key), values)
+
+    def advance(self):
+        self.head = (self.head + 1) % self.buffer.shape[1]
+
+    def copy(self):
+        return TroopTimeline(self.buffer.copy(), self.head)
 
 
 class Game:
@@ -23,7 +73,7 @@ class Game:
             self.distance_matrix[factory_1, factory_2], self.distance_matrix[factory_2, factory_1] = distance, distance
         self.max_distance = np.max(self.distance_matrix)
         self.factories = np.zeros((self.factory_count, 6))
-        self.troops = np.zeros((self.factory_count, self.max_distance + 1, 2), dtype=int)
+        self.troops = TroopTimeline(np.zeros((self.factory_count, self.max_distance + 1, 2), dtype=int))
         self.bombs = defaultdict(list)
 
     def update_factory(self, entity_id, player, troops, prod, blocked):
@@ -42,18 +92,13 @@ class Game:
 
     def current_status(self, input):
         self.entity_count = int(input())  # the number of entities (e.g. factories and troops)
-        for i in range(self.entity_count):
-            inputs = input().split()
-            entity_id, entity_type = int(inputs[0]), inputs[1]
-            arg_1, arg_2, arg_3, arg_4, arg_5 = int(inputs[2]), int(inputs[3]), int(inputs[4]), int(inputs[5]), int(
-                inputs[6])
-            if entity_type == "FACTORY":
-                self.update_factory(entity_id, player=arg_1, troops=arg_2, prod=arg_3, blocked=arg_4)
-            elif entity_type == "TROOP":
-                self.update_troop(entity_id, player=arg_1, source=arg_2, destination=arg_3, troops=arg_4,
-                                  distance=arg_5)
-            elif entity_type == "BOMB":
-                self.update_bomb(entity_id, player=arg_1, source=arg_2, destination=arg_3, distance=arg_4)
+        entities = read_entities(input, self.entity_count)
+        factories = entities[entities[:, 1] == FACTORY]
+        self.factories[np.ix_(factories[:, 0], [ID, PLAYER, TROOPS, PROD, BLOCKED])] = factories[:, [0, 2, 3, 4, 5]]
+        troops = entities[entities[:, 1] == TROOP]
+        self.troops.add_at((troops[:, 4], troops[:, 6], (troops[:, 2] == -1).astype(int)), troops[:, 5])
+        for entity_id, _, player, source, destination, arg_4, _ in entities[entities[:, 1] == BOMB].tolist():
+            self.update_bomb(entity_id, player=player, source=source, destination=destination, distance=arg_4)
         self.update_stats()
 
     def clone(self):
@@ -74,12 +119,12 @@ class Game:
                                                            self.factories[prod_factories, PROD], 0)
 
     def move_cyborgs(self):
-        self.troops = np.roll(self.troops, shift=-1, axis=1)
+        self.troops.advance()
 
     def solve_battles(self):
-        troop_balance = self.troops[:, :, PLAYER_MAP[1]] - self.troops[:, :, PLAYER_MAP[-1]]
-        incoming, factory_troops = abs(troop_balance[:, 0]), self.factories[:, TROOPS]
-        attack_player, factory_player = np.sign(troop_balance[:, 0]), self.factories[:, PLAYER]
+        troop_balance = self.troops[:, 0, PLAYER_MAP[1]] - self.troops[:, 0, PLAYER_MAP[-1]]
+        incoming, factory_troops = abs(troop_balance), self.factories[:, TROOPS]
+        attack_player, factory_player = np.sign(troop_balance), self.factories[:, PLAYER]
         outcome_troops = np.where(factory_player == attack_player, factory_troops + incoming, factory_troops - incoming)
         outcome_player = np.where(outcome_troops >= 0, factory_player, attack_player)
         outcome_troops = np.abs(outcome_troops)
@@ -91,7 +136,7 @@ class Game:
             f_player = self.factories[:, PLAYER] == player
             self.player_production[player] = np.sum(self.factories[f_player, PROD])
             self.player_troops[player] = np.sum(self.factories[f_player, TROOPS]) + \
-                                         np.sum(self.troops[:, :, PLAYER_MAP[player]])
+                                         np.sum(self.troops.buffer[:, :, PLAYER_MAP[player]])
 
     def next_state(self, action):
         # print(f"In NEXT STATE", file=sys.stderr, flush=True)
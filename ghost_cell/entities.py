@@ -1,6 +1,7 @@
 from ghost_cell.exception import InvalidAction
 
 class Entity:
+    __slots__ = ("entity_id", "player")
 
     def __init__(self, entity_id, player):
         self.entity_id = entity_id
@@ -8,15 +9,16 @@ class Entity:
 
 
 class MovingEntity(Entity):
+    __slots__ = ("source", "destination")
 
-    def __init__(self, entity_id, player, source, destination, distance):
+    def __init__(self, entity_id, player, source, destination):
         super().__init__(entity_id, player)
         self.source = source
         self.destination = destination
-        self.distance = distance
 
 
 class Factory(Entity):
+    __slots__ = ("troops", "prod", "blocked", "_point")
 
     def __init__(self, entity_id, player, troops, prod):
         super().__init__(entity_id, player)
@@ -59,30 +61,43 @@ class Factory(Entity):
 
 
 class MovingTroop(MovingEntity):
+    # Troops do not count their distance down, the scenario gives the remaining one from the move phase they arrive at
+    __slots__ = ("troops", "arrival")
 
-    def __init__(self, entity_id: int, player: int, source: Factory, destination: Factory, troops: int, distance: int):
-        super().__init__(entity_id, player, source, destination, distance)
+    def __init__(self, entity_id: int, player: int, source: Factory, destination: Factory, troops: int, arrival: int):
+        super().__init__(entity_id, player, source, destination)
         self.troops = troops
+        self.arrival = arrival
 
     @property
     def entity_type(self):
         return "TROOP"
 
-    @property
-    def str(self):
-        return " ".join(map(str, [self.entity_id, self.entity_type, self.player, self.source, self.destination,
-                                  self.troops, self.distance]))
 
-    def move(self):
-        if self.distance > 0:
-            self.distance -= 1
-        else:
-            pass
+class TroopPool:
+    # Troops that reached their factory are kept and handed out again for the next moves instead of a new object
+
+    def __init__(self):
+        self.free = list()
+
+    def acquire(self, entity_id: int, player: int, source: Factory, destination: Factory, troops: int, arrival: int):
+        if len(self.free) == 0:
+            return MovingTroop(entity_id, player, source, destination, troops, arrival)
+        troop = self.free.pop()
+        troop.__init__(entity_id, player, source, destination, troops, arrival)
+        return troop
+
+    def release(self, troop: MovingTroop):
+        troop.source, troop.destination = None, None
+        self.free.append(troop)
+
 
 class Bomb(MovingEntity):
+    __slots__ = ("distance",)
 
     def __init__(self, entity_id: int, player: int, source: Factory, destination: Factory, distance: int):
-        super().__init__(entity_id, player, source, destination, distance)
+        super().__init__(entity_id, player, source, destination)
+        self.distance = distance
 
     @property
     def entity_type(self):
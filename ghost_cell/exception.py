@@ -1,2 +1,6 @@
 class InvalidAction(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class BotCrashed(Exception):
+    pass
@@ -0,0 +1,129 @@
+from time import time
+
+from ghost_cell.bots import lightweight_bot, champion, value_matrix_bot, heuristic_bot
+
+
+class InProcessPlayer:
+    # Gets the same turn input a bot would read from stdin and returns its action plan line, without any pipe
+    default_params = dict()
+
+    def __init__(self, **params):
+        self.params = {**self.default_params, **params}
+        self.initialized = False
+        self.parse_time = 0.
+
+    def play(self, input_str):
+        lines = iter(input_str.split("\n"))
+        return self.turn(lambda: next(lines))
+
+    def turn(self, input):
+        if not self.initialized:
+            self.initialize(input)
+            self.initialized = True
+        start = time()
+        self.parse(input)
+        self.parse_time = time() - start
+        return self.think()
+
+    def initialize(self, input):
+        raise NotImplementedError
+
+    def parse(self, input):
+        raise NotImplementedError
+
+    def think(self):
+        raise NotImplementedError
+
+
+class WaitPlayer(InProcessPlayer):
+
+    def play(self, input_str):
+        return "WAIT"
+
+    def initialize(self, input):
+        input()
+        for _ in range(int(input())):
+            input()
+
+    def parse(self, input):
+        for _ in range(int(input())):
+            input()
+
+    def think(self):
+        return "WAIT"
+
+
+class LightweightPlayer(InProcessPlayer):
+    bot = lightweight_bot
+    default_params = dict(moving_troop_dist_th=5, moving_troop_discount=1., stationing_troop_dist_th=3,
+                          stationing_troop_discount=0.7)
+
+    def initialize(self, input):
+        self.game = self.bot.GameState()
+        self.game.initialize(input)
+        self.agent = self.bot.Player(player_id=1, **self.params)
+        self.agent.initialize(self.game)
+
+    def parse(self, input):
+        self.game.current_status(input)
+
+    def think(self):
+        self.agent._update_from_state(self.game)
+        self.agent.select_plan()
+        plan = ";".join(self.agent.action_list)
+        self.agent.reset()
+        self.game.reset()
+        return plan
+
+
+class ChampionPlayer(LightweightPlayer):
+    bot = champion
+
+
+class ValueMatrixPlayer(InProcessPlayer):
+    default_params = dict(moving_troop_dist_th=100, moving_troop_discount=0.99, stationing_troop_dist_th=100,
+                          stationing_troop_discount=0.7)
+
+    def initialize(self, input):
+        self.game = value_matrix_bot.GameState()
+        self.game.initialize(input)
+        self.agent = value_matrix_bot.Player(player_id=1, **self.params)
+        self.agent.initialize(self.game)
+
+    def parse(self, input):
+        self.game.current_status(input)
+
+    def think(self):
+        self.agent._update_from_state(self.game)
+        self.agent.select_plan()
+        plan = ";".join(self.agent.action_list)
+        self.agent.reset()
+        self.game.troops[:, :, :] = 0
+        return plan
+
+
+class HeuristicPlayer(InProcessPlayer):
+    default_params = dict(time_limit=35)
+
+    def initialize(self, input):
+        self.game = heuristic_bot.Game()
+        self.game.initialize(input)
+        self.agent = heuristic_bot.Player(player_id=1)
+
+    def parse(self, input):
+        self.game.current_status(input)
+
+    def think(self):
+        plan = self.agent.get_plan(self.game, time_limit=self.params["time_limit"])
+        self.game.troops[:, :, :] = 0
+        return ";".join(plan) if len(plan) > 0 else "WAIT"
+
+
+IN_PROCESS_PLAYERS = {"wait_player.py": WaitPlayer, "lightweight_bot.py": LightweightPlayer, "champion.py": ChampionPlayer,
+                      "value_matrix_bot.py": ValueMatrixPlayer, "heuristic_bot.py": HeuristicPlayer}
+
+
+def in_process_player(bot_name, **params):
+    if bot_name not in IN_PROCESS_PLAYERS:
+        raise ValueError(f"Bot {bot_name} has no in-process adapter, available: {list(IN_PROCESS_PLAYERS)}")
+    return IN_PROCESS_PLAYERS[bot_name](**params)
@@ -5,10 +5,15 @@ from collections import defaultdict
 from subprocess import Popen, PIPE
 import select
 
-from ghost_cell.entities import Factory, MovingTroop, Bomb
-from ghost_cell.exception import InvalidAction
+from ghost_cell.entities import Factory, Bomb, TroopPool
+from ghost_cell.exception import InvalidAction, BotCrashed
 from ghost_cell.constants import TIMEOUT_MOVE
+from ghost_cell.player import InProcessPlayer
 
+# Columns of the per game latency array, one row per bot answer, times in seconds and nan when not measurable
+LATENCY_COLUMNS = ["turn", "player", "total", "parse", "think", "write"]
+# Owner column of an entity line as seen by a player
+OWNER_STR = {-1: "-1", 0: "0", 1: "1"}
 
 
 class Battle:
@@ -19,11 +24,8 @@ class Battle:
         self.id_incoming = list()
 
     def add_to_battle(self, troop):
-        if (troop.distance == 0) and (troop.destination == self.factory):
-            self.incoming += troop.troops * np.sign(troop.player)
-            self.id_incoming.append(troop.entity_id)
-        else:
-            pass
+        self.incoming += troop.troops * np.sign(troop.player)
+        self.id_incoming.append(troop.entity_id)
 
     def resolve(self):
         incoming_player = np.sign(self.incoming)
@@ -36,7 +38,7 @@ class Battle:
 
     def clean_scenario(self, scenario):
         for i in self.id_incoming:
-            scenario.troops.pop(i)
+            scenario.troop_pool.release(scenario.troops.pop(i))
         self.id_incoming = list()
 
 
@@ -51,6 +53,10 @@ class Scenario:
             self.distance_matrix[factory_1, factory_2], self.distance_matrix[factory_2, factory_1] = distance, distance
         self.factories = factories
         self.troops = dict()
+        self.troop_pool = TroopPool()
+        # Troops do not move one by one, they are indexed by the move phase they arrive at
+        self.elapsed = 0
+        self.arrivals = defaultdict(list)
         self.bombs = dict()
         self.battles = [Battle(factory) for factory in self.factories]
         self.players = dict()
@@ -60,6 +66,8 @@ class Scenario:
         self.winner = -2
         self.win_condition = None
         self.turn = 1
+        self.latency = list()
+        self.factory_lines = dict()
 
     @property
     def players(self):
@@ -89,6 +97,22 @@ class Scenario:
     def entity_count(self):
         return len(self.factories) + len(self.troops) + len(self.bombs)
 
+    def add_troop(self, player, source, destination, troops, distance):
+        # A troop still at its destination between two turns arrives with the next move, as a moving one would
+        troop = self.troop_pool.acquire(entity_id=self.troop_id, player=player, source=source,
+                                        destination=destination, troops=troops, arrival=self.elapsed + max(distance, 1))
+        self.troops[troop.entity_id] = troop
+        self.arrivals[troop.arrival].append(troop.entity_id)
+        self.troop_id += 1
+        return troop
+
+    def troop_distance(self, troop):
+        return troop.arrival - self.elapsed
+
+    def troop_line(self, troop):
+        return (f"{troop.entity_id} TROOP ", troop.player,
+                f" {troop.source.entity_id} {troop.destination.entity_id} {troop.troops} {self.troop_distance(troop)}")
+
     def check_win_condition(self):
         score = self.score
         if (score[1] == 0) and (score[-1] > 0):
@@ -122,8 +146,7 @@ class Scenario:
     def play(self):
 
         # Move troops and bombs
-        for _, troop in self.troops.items():
-            troop.move()
+        self.elapsed += 1
 
         about_to_explode = list()
         for _, bomb in self.bombs.items():
@@ -131,34 +154,14 @@ class Scenario:
             if bomb.distance == 0:
                 about_to_explode.append(bomb.entity_id)
 
-        input_str = self.input
-        #print(f"Turn {self.turn}", file=sys.stderr)
-        #print(f"{len(self.troops)}")
-        for player, bot in self.players.items():
-            bot.stdin.write(input_str[player]+"\n")
-            bot.stdin.flush()
-            try:
-                start = time()
-                action_plan = read_from_stdout(bot, TIMEOUT_MOVE)
-            except TimeoutError:
-                print(f"Player {player} did not answer in time |{(time() - start) * 1e3}ms", file=sys.stderr)
-                self.winner = -1 * player
-                self.win_condition = "timeout"
-                return
-            else:
-                for action_str in action_plan.replace("\n", "").split(";"):
-                    try:
-                        self.apply_action(action_str, player)
-                    except InvalidAction:
-                        print(f"Player {player} invalid action input {action_str}")
-                        self.winner = -1 * player
-                        self.win_condition = "invalid action"
-                        return
+        if not self.ask_players(self.input):
+            return
 
         for factory in self.factories:
             factory.produce()
 
-        for _, troop in self.troops.items():
+        for troop_id in self.arrivals.pop(self.elapsed, list()):
+            troop = self.troops[troop_id]
             self.battles[troop.destination.entity_id].add_to_battle(troop)
 
         for battle in self.battles:
@@ -172,6 +175,34 @@ class Scenario:
         self.check_win_condition()
         self.turn += 1
 
+    def ask_players(self, input_str):
+        for player, bot in self.players.items():
+            start = time()
+            try:
+                action_plan, (parse, think, write) = request_plan(bot, input_str[player], TIMEOUT_MOVE)
+            except TimeoutError:
+                self.latency.append((self.turn, player, time() - start, np.nan, np.nan, np.nan))
+                print(f"Player {player} did not answer in time |{(time() - start) * 1e3}ms", file=sys.stderr)
+                self.winner = -1 * player
+                self.win_condition = "timeout"
+                return False
+            except BotCrashed:
+                print(f"Player {player} crashed", file=sys.stderr)
+                self.winner = -1 * player
+                self.win_condition = "crash"
+                return False
+            else:
+                self.latency.append((self.turn, player, time() - start, parse, think, write))
+                for action_str in action_plan.replace("\n", "").split(";"):
+                    try:
+                        self.apply_action(action_str, player)
+                    except InvalidAction:
+                        print(f"Player {player} invalid action input {action_str}")
+                        self.winner = -1 * player
+                        self.win_condition = "invalid action"
+                        return False
+        return True
+
     @property
     def input(self):
         input_str = dict()
@@ -181,23 +212,39 @@ class Scenario:
         else:
             input_common = [str(self.entity_count)]
 
+        lines = [self.factory_line(e) for e in self.factories] + \
+                [self.troop_line(e) for _, e in self.troops.items()] + \
+                [(f"{e.entity_id} BOMB ", e.player, f" {e.source.entity_id} {e.destination.entity_id} {e.distance} 0")
+                 for _, e in self.bombs.items()]
         for player in self.players.keys():
-            input_factory = [" ".join(map(str, [e.entity_id, e.entity_type, e.player * player, e.troops, e.prod,
-                                                e.blocked, "0"])) for e in self.factories]
-            input_troops = [" ".join(map(str, [e.entity_id, e.entity_type, e.player * player, e.source.entity_id,
-                                               e.destination.entity_id, e.troops, e.distance]))
-                            for _, e in self.troops.items()]
-            input_bombs = [" ".join(map(str, [e.entity_id, e.entity_type, e.player * player, e.source.entity_id,
-                                              e.destination.entity_id, e.distance, "0"])) for _, e in self.bombs.items()]
-            input_str[player] = "\n".join(input_common + input_factory + input_troops + input_bombs)
+            input_str[player] = join_input(input_common, lines, player)
         return input_str
 
+    def factory_line(self, factory):
+        # Factory lines are kept until the factory owner, troops, prod or blocked status changes
+        key = (factory.player, factory.troops, factory.prod, factory.blocked)
+        cached = self.factory_lines.get(factory.entity_id)
+        if (cached is None) or (cached[0] != key):
+            cached = key, (f"{factory.entity_id} FACTORY ", factory.player,
+                           f" {factory.troops} {factory.prod} {factory.blocked} 0")
+            self.factory_lines[factory.entity_id] = cached
+        return cached[1]
+
+    @property
+    def latency_array(self):
+        return np.array(self.latency, dtype=np.float32).reshape((-1, len(LATENCY_COLUMNS)))
+
     def match(self):
         while self.winner == -2:
             self.play()
         #print(f"Winner is {self.winner} by {self.win_condition}")
         return self.winner
 
+def join_input(input_common, lines, player):
+    # Entity lines are serialized once per turn as (head, owner, tail), only the owner sign depends on the player
+    return "\n".join(input_common + [head + OWNER_STR[owner * player] + tail for head, owner, tail in lines])
+
+
 def apply_message(scenario):
     pass
 
@@ -214,11 +261,9 @@ def apply_move(scenario, source, destination, n_cyborgs, player):
     else:
         n_cyborgs = min(int(n_cyborgs), scenario.factories[int(source)].troops)
         scenario.factories[int(source)].troops -= n_cyborgs
-        scenario.troops[scenario.troop_id] = MovingTroop(
-            entity_id=scenario.troop_id, source=scenario.factories[int(source)],
-            destination=scenario.factories[int(destination)], troops=n_cyborgs,
-            distance=scenario.distance_matrix[int(source), int(destination)], player=player)
-        scenario.troop_id += 1
+        scenario.add_troop(source=scenario.factories[int(source)], destination=scenario.factories[int(destination)],
+                           troops=n_cyborgs, distance=scenario.distance_matrix[int(source), int(destination)],
+                           player=player)
 
 def apply_bomb(scenario, source, destination, player):
     if source == destination:
@@ -242,6 +287,27 @@ def apply_inc(scenario, factory, player):
         scenario.factories[factory].increment_prod()
 
 
+def request_plan(bot, input_str, timeout):
+    # Returns the plan and its parse, think and write times, an external bot parses its input while we wait
+    if isinstance(bot, InProcessPlayer):
+        start = time()
+        plan = bot.play(input_str)
+        elapsed = time() - start
+        if elapsed > timeout:
+            raise TimeoutError
+        return plan, (bot.parse_time, elapsed - bot.parse_time, np.nan)
+    else:
+        start = time()
+        try:
+            bot.stdin.write(input_str + "\n")
+            bot.stdin.flush()
+        except OSError:
+            raise BotCrashed
+        written = time()
+        plan = read_from_stdout(bot, timeout)
+        return plan, (np.nan, time() - written, written - start)
+
+
 def read_from_stdout(process, timeout):
     plan = None
     while not plan:
@@ -249,6 +315,8 @@ def read_from_stdout(process, timeout):
         if not buff:
             raise TimeoutError
         plan = buff[0].readline()
+        if plan == "":
+            raise BotCrashed
     return plan
 
 
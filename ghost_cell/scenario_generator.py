@@ -1,9 +1,24 @@
+import os
+import argparse
+from functools import lru_cache
+
 import numpy as np
 
 from ghost_cell.scenario import Scenario
 from ghost_cell.entities import Factory
 from ghost_cell.constants import WIDTH, HEIGHT, EXTRA_SPACE_BETWEEN_FACTORIES, MIN_PRODUCTION_RATE, MAX_PRODUCTION_RATE,\
-    PLAYER_INIT_UNITS_MIN, PLAYER_INIT_UNITS_MAX, MIN_TOTAL_PRODUCTION_RATE
+    PLAYER_INIT_UNITS_MIN, PLAYER_INIT_UNITS_MAX, MIN_TOTAL_PRODUCTION_RATE, MIN_FACTORY_COUNT, MAX_FACTORY_COUNT
+
+# Candidate positions drawn at once while placing factories
+CANDIDATE_BLOCK = 64
+# Map corpus columns, one .npy file per array so every simulation process can memory map them read only
+PLAYER, TROOPS, PROD = 0, 1, 2
+CORPUS_FILES = ["factory_count", "factories", "distances"]
+
+parser = argparse.ArgumentParser(description='Pre-generate a corpus of ghost in the cell maps')
+parser.add_argument('--corpus', type=str, help='directory the corpus is written to', required=True)
+parser.add_argument('--n_maps', type=int, help='number of maps', required=True)
+parser.add_argument('--seed', type=int, default=None)
 
 
 class ScenarioGenerator:
@@ -12,66 +27,125 @@ class ScenarioGenerator:
         pass
 
     @staticmethod
-    def generate(factory_count):
-        factories = list()
+    def generate(factory_count, rng=None):
+        # A local np.random.Generator makes the map reproducible, without one the global numpy state is used
+        randint = np.random.randint if rng is None else rng.integers
         factory_count = factory_count if factory_count % 2 == 1 else factory_count + 1
         factory_radius = 600 if factory_count > 10 else 700
-        min_space_between_factories = 2 * (factory_radius + EXTRA_SPACE_BETWEEN_FACTORIES)
-
-        center = Factory(0, 0, 0, 0)
-        center.point = (WIDTH / 2, HEIGHT / 2)
-        factories.append(center)
-
-        total_production_rate = 0
-        i = 1
-        while i < (factory_count - 1) :
-            x_i = np.random.randint(0, WIDTH / 2 - 2 * factory_radius, 1)[0] + factory_radius + EXTRA_SPACE_BETWEEN_FACTORIES
-            y_i = np.random.randint(0, HEIGHT - 2 * factory_radius, 1)[0] + factory_radius + EXTRA_SPACE_BETWEEN_FACTORIES
-            valid = True
-            for j in range(i):
-                x_j, y_j = factories[j].point
-                distance = int(np.sqrt((x_i - x_j)**2 + (y_i - y_j)**2))
-                if distance < min_space_between_factories:
-                    valid = False
-                    break
-
-            if valid:
-                prod = np.random.randint(MIN_PRODUCTION_RATE, MAX_PRODUCTION_RATE, 1)[0]
-                total_production_rate += prod * 2
-                if i == 1:
-                    player_troops = np.random.randint(PLAYER_INIT_UNITS_MIN, PLAYER_INIT_UNITS_MAX, 1)[0]
-                    factories.append(Factory(entity_id=i, player=1, troops=player_troops, prod=prod))
-                    factories[i].point = (x_i, y_i)
-                    i += 1
-                    factories.append(Factory(entity_id=i, player=-1, troops=player_troops, prod=prod))
-                    factories[i].point = (WIDTH - x_i, HEIGHT - y_i)
-                    i += 1
-                else:
-                    troops = np.random.randint(0, 5 * prod + 1, 1)[0]
-                    factories.append(Factory(entity_id=i, player=0, troops=troops, prod=prod))
-                    factories[i].point = (x_i, y_i)
-                    i += 1
-                    factories.append(Factory(entity_id=i, player=0, troops=troops, prod=prod))
-                    factories[i].point = (WIDTH - x_i, HEIGHT - y_i)
-                    i += 1
-
-        while total_production_rate < MIN_TOTAL_PRODUCTION_RATE:
-            for factory in factories[1:]:
-                if (factory.prod < MAX_PRODUCTION_RATE) & (total_production_rate < MIN_TOTAL_PRODUCTION_RATE):
-                    factory.prod += 1
-                    total_production_rate += 1
-
-        links = list()
-        for i in range(factory_count):
-            for j in range(i+1, factory_count):
-                links.append((i, j, get_distance(factories[i], factories[j], factory_radius)))
+
+        points = place_factories(factory_count, factory_radius, randint)
+        pair_count = (factory_count - 1) // 2
+        prod = np.repeat(randint(MIN_PRODUCTION_RATE, MAX_PRODUCTION_RATE, pair_count), 2)
+        troops = np.repeat(randint(0, 5 * prod[::2] + 1, pair_count), 2)
+        troops[:2] = randint(PLAYER_INIT_UNITS_MIN, PLAYER_INIT_UNITS_MAX, 1)[0]
+        player = np.zeros(factory_count - 1, dtype=int)
+        player[:2] = [1, -1]
+
+        total_production_rate = np.sum(prod)
+        for i in range(factory_count - 1):
+            if (prod[i] < MAX_PRODUCTION_RATE) & (total_production_rate < MIN_TOTAL_PRODUCTION_RATE):
+                prod[i] += 1
+                total_production_rate += 1
+
+        factories = [Factory(0, 0, 0, 0)]
+        for i in range(factory_count - 1):
+            factories.append(Factory(entity_id=i + 1, player=int(player[i]), troops=int(troops[i]), prod=int(prod[i])))
+        for factory, point in zip(factories, points.tolist()):
+            factory.point = tuple(point)
+
+        factory_1, factory_2 = np.triu_indices(factory_count, 1)
+        distances = get_distance_matrix(points, factory_radius)[factory_1, factory_2]
+        links = list(zip(factory_1.tolist(), factory_2.tolist(), distances.tolist()))
 
         scenario = Scenario(factories=factories, links=links)
         return scenario
 
+    @staticmethod
+    def generate_corpus(path, n_maps, rng=None):
+        randint = np.random.randint if rng is None else rng.integers
+        os.makedirs(path, exist_ok=True)
+        factory_count = np.zeros(n_maps, dtype=np.int8)
+        factories = np.zeros((n_maps, MAX_FACTORY_COUNT, 3), dtype=np.int16)
+        distances = np.zeros((n_maps, MAX_FACTORY_COUNT, MAX_FACTORY_COUNT), dtype=np.int8)
+        for k, n_factory in enumerate(randint(MIN_FACTORY_COUNT, MAX_FACTORY_COUNT, n_maps)):
+            scenario = ScenarioGenerator.generate(factory_count=n_factory, rng=rng)
+            n = scenario.factory_count
+            factory_count[k] = n
+            factories[k, :n] = [[f.player, f.troops, f.prod] for f in scenario.factories]
+            distances[k, :n, :n] = scenario.distance_matrix
+        for name, array in zip(CORPUS_FILES, [factory_count, factories, distances]):
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        return MapCorpus(path)
+
+
+class MapCorpus:
+
+    def __init__(self, path):
+        self.path = path
+        self.factory_count, self.factories, self.distances = \
+            [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in CORPUS_FILES]
+
+    def __len__(self):
+        return self.factory_count.shape[0]
+
+    def scenario(self, index):
+        n = int(self.factory_count[index])
+        factories = [Factory(entity_id=i, player=player, troops=troops, prod=prod)
+                     for i, (player, troops, prod) in enumerate(self.factories[index, :n].tolist())]
+        factory_1, factory_2 = np.triu_indices(n, 1)
+        distances = self.distances[index, factory_1, factory_2]
+        return Scenario(factories=factories, links=list(zip(factory_1.tolist(), factory_2.tolist(), distances.tolist())))
+
+
+@lru_cache(maxsize=None)
+def load_corpus(path):
+    # Opened once per process, the mapped pages are shared through the OS page cache
+    return MapCorpus(path)
+
+
+def place_factories(factory_count, factory_radius, randint):
+    # Candidates are drawn in blocks and accepted in draw order, the first one far enough from every factory
+    # already placed and from its mirror wins, which is what drawing them one at a time would give
+    min_space_between_factories = 2 * (factory_radius + EXTRA_SPACE_BETWEEN_FACTORIES)
+    points = np.zeros((factory_count, 2))
+    points[0] = WIDTH / 2, HEIGHT / 2
+    placed = 1
+    while placed < factory_count:
+        candidates = np.column_stack([
+            randint(0, WIDTH / 2 - 2 * factory_radius, CANDIDATE_BLOCK),
+            randint(0, HEIGHT - 2 * factory_radius, CANDIDATE_BLOCK)]) + factory_radius + EXTRA_SPACE_BETWEEN_FACTORIES
+        gaps = np.sqrt(np.sum((candidates[:, None, :] - points[None, :placed, :]) ** 2, axis=2)).astype(int)
+        valid = np.all(gaps >= min_space_between_factories, axis=1)
+        for k in range(CANDIDATE_BLOCK):
+            if not valid[k]:
+                continue
+            points[placed] = candidates[k]
+            points[placed + 1] = WIDTH - candidates[k, 0], HEIGHT - candidates[k, 1]
+            gaps = np.sqrt(np.sum((candidates[:, None, :] - points[None, placed:placed + 2, :]) ** 2, axis=2)).astype(int)
+            valid &= np.all(gaps >= min_space_between_factories, axis=1)
+            placed += 2
+            if placed == factory_count:
+                break
+    return points
+
+
+def get_distance_matrix(points, factory_radius):
+    gaps = np.sqrt(np.sum((points[:, None, :] - points[None, :, :]) ** 2, axis=2))
+    return np.round((gaps - factory_radius * 2) / 800).astype(int)
+
 
 def get_distance(factory_1, factory_2, factory_radius):
     d = round(
               (np.sqrt((factory_1.point[0] - factory_2.point[0]) ** 2 + (factory_1.point[1] - factory_2.point[1]) ** 2)
                - factory_radius * 2) / 800)
     return d
+
+
+def main():
+    args = parser.parse_args()
+    corpus = ScenarioGenerator.generate_corpus(args.corpus, args.n_maps, rng=np.random.default_rng(args.seed))
+    print(f"{len(corpus)} maps written to {args.corpus}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import sys
 import os
+import csv
+import atexit
 from time import time
+from collections import defaultdict
 from subprocess import Popen, PIPE
 import argparse
 import multiprocessing as mp
@@ -11,12 +14,28 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 
-from ghost_cell.scenario_generator import ScenarioGenerator
-from ghost_cell.constants import MIN_FACTORY_COUNT, MAX_FACTORY_COUNT
+from ghost_cell.scenario_generator import ScenarioGenerator, load_corpus
+from ghost_cell.array_scenario import ArrayScenario
+from ghost_cell.batch_scenario import BatchScenario
+from ghost_cell.scenario import read_from_stdout, LATENCY_COLUMNS
+from ghost_cell.player import in_process_player, IN_PROCESS_PLAYERS
+from ghost_cell.bot_worker import NEW_GAME, READY
+from ghost_cell.exception import BotCrashed
+from ghost_cell.constants import MIN_FACTORY_COUNT, MAX_FACTORY_COUNT, TIMEOUT_MOVE
 
 BOT_PATH = os.path.abspath("ghost_cell/bots")
 RESULT_PATH = os.path.abspath("simulations")
 NUM_CPU = psutil.cpu_count(logical=False)
+HANDSHAKE_TIMEOUT = 10
+FAULTS = ("timeout", "crash")
+# Paired evaluation sequential test, pair score difference to detect and error rates
+SPRT_DELTA = 0.05
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+SPRT_MIN_PAIRS = 10
+LATENCY_STATS = ["p50", "p95", "p99", "max"]
+RESULT_FIELDS = ["game", "win", "win_condition", "turn", "factory_count", "as_player", "final_score", "playing_time",
+                 "seed", "simulation_seed", "map"] + [f"latency_{k}_{stat}" for k in [1, 2] for stat in LATENCY_STATS]
 
 parser = argparse.ArgumentParser(description='Simulate ghost in the cell game')
 parser.add_argument('--n_sim', metavar='N', type=int, help='number of simulations', required=True)
@@ -24,6 +43,29 @@ parser.add_argument('--player_1', type=str, help='bot to use as player 1', requi
 parser.add_argument('--player_2', type=str, help='bot to use as player 2', required=True)
 parser.add_argument('--parallel', type=bool, help='if simulation should run in parallel on cpus', required=True,
                     default=False)
+parser.add_argument('--in_process', action='store_true',
+                    help='run the bots inside the referee process instead of talking to them through pipes')
+parser.add_argument('--engine', type=str, choices=['object', 'array'], default='object',
+                    help='referee implementation, entity objects or numpy arrays')
+parser.add_argument('--batch_size', type=int, default=0,
+                    help='step this many in-process games in lockstep with the batched array referee')
+parser.add_argument('--output', type=str, default=None,
+                    help='csv file the game results are appended to as they finish, dated file in simulations/ by default')
+parser.add_argument('--resume', action='store_true',
+                    help='skip the games already recorded in the output file, with the simulation seed recorded there')
+parser.add_argument('--seed', type=int, default=None,
+                    help='simulation seed every game map and side assignment is derived from, random by default')
+parser.add_argument('--replay', type=int, default=None, metavar='GAME',
+                    help='only play again game number GAME of the simulation given by --seed or recorded in --output')
+parser.add_argument('--corpus', type=str, default=None,
+                    help='directory of a map corpus built by ghost_cell.scenario_generator, game n plays map n modulo '
+                         'the corpus size instead of generating a new map')
+parser.add_argument('--paired', action='store_true',
+                    help='play every map twice with the bots swapping sides, n_sim is then the number of maps')
+parser.add_argument('--sprt', action='store_true',
+                    help='with --paired, stop as soon as a sequential test tells which bot is stronger')
+parser.add_argument('--persistent', action='store_true',
+                    help='keep bot worker processes alive and reuse them across the games of a simulation worker')
 
 class Simulator:
 
@@ -31,62 +73,325 @@ class Simulator:
         pass
 
     @staticmethod
-    def simulate(factory_count, player_1, player_2):
+    def simulate(factory_count, player_1, player_2, in_process=False, engine="object", persistent=False, seed=None,
+                 corpus=None, map_index=None, side=None):
+        rng = np.random.default_rng(seed)
 
-        if player_1.endswith(".py"):
-            p0 = Popen(["python", f"{BOT_PATH}/{player_1}"], stdout=PIPE, stdin=PIPE, stderr=sys.stderr, shell=False, text=True,
-                       bufsize=-1)
+        if in_process:
+            p0, p1 = in_process_player(player_1), in_process_player(player_2)
+        elif persistent:
+            bot_pool = get_bot_pool()
+            p0, p1 = bot_pool.acquire(player_1), bot_pool.acquire(player_2)
         else:
-            p0 = Popen([f"cd {BOT_PATH}/./{player_1}"], stdout=PIPE, stdin=PIPE, stderr=sys.stderr, shell=False, text=True, bufsize=-1)
-        if player_2.endswith(".py"):
-            p1 = Popen(['python', f"{BOT_PATH}/{player_2}"], stdout=PIPE, stdin=PIPE, stderr=sys.stderr, shell=False, text=True, bufsize=-1)
-        else:
-            p1 = Popen([f"{BOT_PATH}/./{player_2}"], stdout=PIPE, stdin=PIPE, stderr=sys.stderr, shell=False, text=True, bufsize=-1)
+            p0, p1 = spawn_bot(player_1), spawn_bot(player_2)
 
-        scenario = ScenarioGenerator.generate(factory_count=factory_count)
-        if int(time()*1e4) % 2 == 0:
+        if corpus is None:
+            scenario = ScenarioGenerator.generate(factory_count=factory_count, rng=rng)
+        else:
+            scenario = corpus.scenario(map_index)
+            factory_count = scenario.factory_count
+        if engine == "array":
+            scenario = ArrayScenario.from_scenario(scenario)
+        if (rng.integers(2) == 0) if side is None else (side == 1):
             scenario.players = {1: p0, -1: p1}
             bot_player = {1: player_1, -1: player_2}
+            side_0 = 1
         else:
             scenario.players = {-1: p0, 1: p1}
             bot_player = {-1: player_1, 1: player_2}
+            side_0 = -1
         start_game = time()
         scenario.match()
         print(f"Winner is {bot_player.get(scenario.winner, 'draw')} by {scenario.win_condition} in "
               f"{np.around(time()-start_game, 2)}s", file=sys.stderr)
-        result = {"win": bot_player.get(scenario.winner, 'draw'), "win_condition": scenario.win_condition,
-                  "turn": scenario.turn, "factory_count": factory_count, "as_player": scenario.winner,
-                  "final_score": " ".join([f"{player}|{score} " for player, score in scenario.score.items()]),
-                  "playing_time": time() - start_game}
+        result = game_result(scenario, bot_player, factory_count, time() - start_game, seed, map_index, side_0)
         #self.count += 1
 
-        p0.kill(), p1.kill()
-        p0.wait(), p1.wait()
+        if in_process:
+            pass
+        elif persistent:
+            # A bot that timed out or crashed may still have a stale answer in its pipe, never reuse it
+            faulty = scenario.win_condition in FAULTS
+            bot_pool.release(player_1, p0, reusable=not (faulty and scenario.winner == -side_0))
+            bot_pool.release(player_2, p1, reusable=not (faulty and scenario.winner == side_0))
+        else:
+            p0.kill(), p1.kill()
+            p0.wait(), p1.wait()
 
         return result
 
+    @staticmethod
+    def simulate_batch(factory_counts, player_1, player_2, seeds=None, corpus=None, map_indices=None, sides=None):
+        seeds = [None] * len(factory_counts) if seeds is None else seeds
+        map_indices = [None] * len(factory_counts) if map_indices is None else map_indices
+        sides = [None] * len(factory_counts) if sides is None else sides
+        rngs = [np.random.default_rng(seed) for seed in seeds]
+        if corpus is None:
+            batch = BatchScenario([ScenarioGenerator.generate(factory_count=n, rng=rng)
+                                   for n, rng in zip(factory_counts, rngs)])
+        else:
+            batch = BatchScenario([corpus.scenario(map_index) for map_index in map_indices])
+            factory_counts = [game.factory_count for game in batch.games]
+        bot_players, player_1_sides = list(), list()
+        for game, rng, side in zip(batch.games, rngs, sides):
+            p0, p1 = in_process_player(player_1), in_process_player(player_2)
+            if (rng.integers(2) == 0) if side is None else (side == 1):
+                game.players = {1: p0, -1: p1}
+                bot_players.append({1: player_1, -1: player_2})
+                player_1_sides.append(1)
+            else:
+                game.players = {-1: p0, 1: p1}
+                bot_players.append({-1: player_1, 1: player_2})
+                player_1_sides.append(-1)
+        start_batch = time()
+        batch.match()
+        playing_time = (time() - start_batch) / batch.game_count
+        return [game_result(game, bot_player, factory_count, playing_time, seed, map_index, side)
+                for game, bot_player, factory_count, seed, map_index, side
+                in zip(batch.games, bot_players, factory_counts, seeds, map_indices, player_1_sides)]
+
+
+class BotPool:
+    # Bot processes that survive between games, told to start over with a NEW_GAME handshake
+
+    def __init__(self):
+        self.idle = defaultdict(list)
+
+    def acquire(self, bot_name):
+        if bot_name not in IN_PROCESS_PLAYERS:
+            return spawn_bot(bot_name)
+        while len(self.idle[bot_name]) > 0:
+            bot = self.idle[bot_name].pop()
+            if start_new_game(bot):
+                return bot
+            kill_bot(bot)
+        bot = spawn_worker(bot_name)
+        if not start_new_game(bot):
+            kill_bot(bot)
+            raise BotCrashed(f"Bot worker {bot_name} did not answer the new game handshake")
+        return bot
+
+    def release(self, bot_name, bot, reusable=True):
+        if reusable and (bot_name in IN_PROCESS_PLAYERS) and (bot.poll() is None):
+            self.idle[bot_name].append(bot)
+        else:
+            kill_bot(bot)
+
+    def close(self):
+        for bots in self.idle.values():
+            for bot in bots:
+                kill_bot(bot)
+        self.idle.clear()
+
+
+_bot_pool = None
+
+
+def get_bot_pool():
+    # One pool per simulation process, workers of a multiprocessing pool each get their own
+    global _bot_pool
+    if _bot_pool is None:
+        _bot_pool = BotPool()
+        atexit.register(_bot_pool.close)
+    return _bot_pool
+
+
+def start_new_game(bot):
+    try:
+        bot.stdin.write(NEW_GAME + "\n")
+        bot.stdin.flush()
+        return read_from_stdout(bot, HANDSHAKE_TIMEOUT).strip() == READY
+    except (OSError, TimeoutError, BotCrashed):
+        return False
+
+
+def kill_bot(bot):
+    bot.kill()
+    bot.wait()
+
+
+def game_result(scenario, bot_player, factory_count, playing_time, seed=None, map_index=None, player_1_side=1):
+    result = {"win": bot_player.get(scenario.winner, 'draw'), "win_condition": scenario.win_condition,
+              "turn": scenario.turn, "factory_count": factory_count, "as_player": scenario.winner,
+              "final_score": " ".join([f"{player}|{score} " for player, score in scenario.score.items()]),
+              "playing_time": playing_time, "seed": seed, "map": map_index}
+    for k, side in [(1, player_1_side), (2, -player_1_side)]:
+        result.update(latency_summary(scenario.latency_array, side, f"latency_{k}"))
+    return result
+
+
+def latency_summary(latency, side, prefix):
+    # Answer time percentiles of one side in ms, to compare against TIMEOUT_MOVE
+    total = latency[latency[:, LATENCY_COLUMNS.index("player")] == side, LATENCY_COLUMNS.index("total")] * 1e3
+    if len(total) == 0:
+        return {f"{prefix}_{stat}": np.nan for stat in LATENCY_STATS}
+    return dict(zip([f"{prefix}_{stat}" for stat in LATENCY_STATS],
+                    np.around(np.append(np.percentile(total, [50, 95, 99]), np.max(total)), 3).tolist()))
+
+
+def spawn_bot(bot_name):
+    if bot_name.endswith(".py"):
+        return Popen(["python", f"{BOT_PATH}/{bot_name}"], stdout=PIPE, stdin=PIPE, stderr=sys.stderr, shell=False,
+                     text=True, bufsize=-1)
+    else:
+        return Popen([f"{BOT_PATH}/./{bot_name}"], stdout=PIPE, stdin=PIPE, stderr=sys.stderr, shell=False, text=True,
+                     bufsize=-1)
+
+
+def spawn_worker(bot_name):
+    return Popen(["python", "-m", "ghost_cell.bot_worker", bot_name], stdout=PIPE, stdin=PIPE, stderr=sys.stderr,
+                 shell=False, text=True, bufsize=-1, cwd=os.path.dirname(os.path.dirname(BOT_PATH)))
+
+
+def play_games(games, player_1, player_2, in_process, engine, persistent, batch, corpus_path=None,
+               simulation_seed=None):
+    game_ids, map_ids, factory_counts, seeds, sides = zip(*games)
+    if corpus_path is None:
+        corpus, map_indices = None, [None] * len(game_ids)
+    else:
+        corpus = load_corpus(corpus_path)
+        map_indices = [map_id % len(corpus) for map_id in map_ids]
+    if batch:
+        records = Simulator.simulate_batch(factory_counts, player_1=player_1, player_2=player_2, seeds=seeds,
+                                           corpus=corpus, map_indices=map_indices, sides=sides)
+    else:
+        records = [Simulator.simulate(factory_count, player_1=player_1, player_2=player_2, in_process=in_process,
+                                      engine=engine, persistent=persistent, seed=seed, corpus=corpus,
+                                      map_index=map_index, side=side)
+                   for factory_count, seed, map_index, side in zip(factory_counts, seeds, map_indices, sides)]
+    return [{"game": game_id, "simulation_seed": simulation_seed, **record}
+            for game_id, record in zip(game_ids, records)]
+
+
+def game_plan(seed, game_id, paired=False):
+    # Factory count and seed of a game only depend on the simulation seed and game number, not on who plays it.
+    # Paired games 2k and 2k+1 play the same map with player_1 on side 1 then on side -1
+    map_id = game_id // 2 if paired else game_id
+    side = (1 - 2 * (game_id % 2)) if paired else None
+    rng = np.random.default_rng([seed, map_id])
+    return game_id, map_id, int(rng.integers(MIN_FACTORY_COUNT, MAX_FACTORY_COUNT)), int(rng.integers(2 ** 32)), side
+
+
+def game_score(win, player_1):
+    return 1. if win == player_1 else 0.5 if win == "draw" else 0.
+
+
+def game_scores(stat, player_1):
+    return {game: game_score(win, player_1) for game, win in zip(stat.game, stat.win)}
+
+
+def pair_scores(scores):
+    return np.array([(scores[game] + scores[game + 1]) / 2 for game in sorted(scores)
+                     if (game % 2 == 0) and (game + 1 in scores)])
+
+
+def sprt(scores, delta=SPRT_DELTA, alpha=SPRT_ALPHA, beta=SPRT_BETA):
+    # Normalized GSPRT on the pair scores of player_1: H0 score 0.5 against H1 score 0.5 +/- delta, one test per bot.
+    # Returns 1 or -1 when player_1 or player_2 is stronger, 0 when neither is by delta, None to keep playing
+    if len(scores) < SPRT_MIN_PAIRS:
+        return None
+    n, mean, var = len(scores), np.mean(scores), max(np.var(scores), 1e-3)
+    llr_1 = n * delta * (2 * mean - 1 - delta) / (2 * var)
+    llr_2 = -n * delta * (2 * mean - 1 + delta) / (2 * var)
+    lower, upper = np.log(beta / (1 - alpha)), np.log((1 - beta) / alpha)
+    if llr_1 >= upper:
+        return 1
+    elif llr_2 >= upper:
+        return -1
+    elif (llr_1 <= lower) and (llr_2 <= lower):
+        return 0
+    return None
+
+
+def recorded_games(output_path):
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return set()
+    return set(pd.read_csv(output_path, usecols=["game"]).game)
+
+
+def recorded_seed(output_path):
+    # Game numbers only point to the same maps with the simulation seed they were played with
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return None
+    stat = pd.read_csv(output_path)
+    if "simulation_seed" not in stat.columns:
+        return None
+    seeds = stat.simulation_seed.dropna().unique()
+    if len(seeds) > 1:
+        raise ValueError(f"Results in {output_path} mix simulation seeds {sorted(seeds)}")
+    return int(seeds[0]) if len(seeds) == 1 else None
+
+
 def main():
     args = parser.parse_args()
-    factory_counts = np.random.randint(MIN_FACTORY_COUNT, MAX_FACTORY_COUNT, args.n_sim)
-    simulate_scenario = partial(Simulator.simulate, player_1=args.player_1, player_2=args.player_2)
-
-    start = time()
-    pool = mp.Pool(NUM_CPU)
-    print(args.parallel)
-    records = list()
-    if args.parallel:
-        print(f"Parallelize simulation on {NUM_CPU} cores")
-        records = pool.map(simulate_scenario, list(factory_counts))
+    if args.output is None:
+        datestamp = datetime.today().strftime('%Y-%m-%d-%H:%M:%S').replace('-', '').replace(':', '')
+        output_path = f"{RESULT_PATH}/simulation_{datestamp}_{args.player_1.split('.')[0]}_vs_" \
+                      f"{args.player_2.split('.')[0]}.csv"
     else:
-        for n_factory in factory_counts:
-            r = simulate_scenario(factory_count=n_factory)
-            records.append(r)
+        output_path = args.output
+    done = recorded_games(output_path) if args.resume else set()
+    seed = recorded_seed(output_path) if args.resume or (args.replay is not None) else None
+    if (seed is not None) and (args.seed is not None) and (seed != args.seed):
+        parser.error(f"--seed {args.seed} differs from the simulation seed {seed} recorded in {output_path}")
+    if (seed is None) and (args.seed is None) and ((len(done) > 0) or (args.replay is not None)):
+        parser.error(f"no simulation seed recorded in {output_path}, give the one the games were played with --seed")
+    seed = args.seed if seed is None else seed
+    seed = np.random.SeedSequence().entropy % 2 ** 32 if seed is None else seed
+    print(f"Simulation seed {seed}")
+    if args.replay is not None:
+        record = play_games([game_plan(seed, args.replay, args.paired)], player_1=args.player_1,
+                            player_2=args.player_2, in_process=args.in_process, engine=args.engine,
+                            persistent=False, batch=False, corpus_path=args.corpus, simulation_seed=seed)[0]
+        print(record)
+        return
+    n_games = 2 * args.n_sim if args.paired else args.n_sim
+    games = [game_plan(seed, game_id, args.paired) for game_id in range(n_games) if game_id not in done]
+    # Small chunks so a slow game only holds back itself, batch mode keeps one batch per task
+    chunk = max(args.batch_size, 1)
+    tasks = [games[i:i + chunk] for i in range(0, len(games), chunk)]
+    run = partial(play_games, player_1=args.player_1, player_2=args.player_2, in_process=args.in_process,
+                  engine=args.engine, persistent=args.persistent, batch=args.batch_size > 0, corpus_path=args.corpus,
+                  simulation_seed=seed)
+    print(f"Simulate {len(games)} games, {len(done)} already recorded in {output_path}")
 
-    datestamp = datetime.today().strftime('%Y-%m-%d-%H:%M:%S').replace('-', '').replace(':', '')
-    stat = pd.DataFrame.from_records(records)
-    stat.to_csv(f"simulations/simulation_{datestamp}_{args.player_1.split('.')[0]}_vs_{args.player_2.split('.')[0]}.csv",
-                index=False)
+    start = time()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "a", newline="") as output:
+        # Rows appended to a file recorded before a column was added keep that file's header
+        fieldnames = RESULT_FIELDS if output.tell() == 0 else pd.read_csv(output_path, nrows=0).columns.tolist()
+        writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
+        if output.tell() == 0:
+            writer.writeheader()
+        if args.parallel:
+            print(f"Parallelize simulation on {NUM_CPU} cores")
+            pool = mp.Pool(NUM_CPU)
+            results = pool.imap_unordered(run, tasks, chunksize=1)
+        else:
+            results = map(run, tasks)
+        n_played, decision = 0, None
+        scores = game_scores(pd.read_csv(output_path), args.player_1) if len(done) > 0 else dict()
+        for records in results:
+            writer.writerows(records)
+            output.flush()
+            n_played += len(records)
+            print(f"\r{n_played}/{len(games)} games ({n_played / (time() - start):.1f} games/sec)", end="",
+                  file=sys.stderr, flush=True)
+            if args.sprt:
+                for record in records:
+                    scores[record["game"]] = game_score(record["win"], args.player_1)
+                decision = sprt(pair_scores(scores))
+                if decision is not None:
+                    break
+        print(file=sys.stderr)
+        if args.parallel:
+            if decision is None:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
 
+    stat = pd.read_csv(output_path)
     n_games = stat.shape[0]
     player_1_wins = sum(stat.win == args.player_1)
     player_2_wins = sum(stat.win == args.player_2)
@@ -94,12 +399,26 @@ def main():
     p_1, p_2 = player_1_wins/(n_games-draws), player_2_wins/(n_games-draws)
     b = 1.96 * np.sqrt(p_1 * p_2 / (n_games - draws))
     print(f"Simulation over in {time() - start}")
-    print(f"Games played {n_games}")
+    print(f"Games played {n_played} ({n_played / (time() - start):.1f} games/sec), {n_games} recorded")
     print(f"{args.player_1} total wons: {player_1_wins}")
     print(f"{args.player_2} total wons: {player_2_wins}")
     print(f"Draws: {draws}")
     print(f"{args.player_1} win probability 95% confidence {p_1 - b:.3f} {p_1:.3f} {p_1 + b:.3f}")
     print(f"{args.player_2} win probability 95% confidence {p_2 - b:.3f} {p_2:.3f} {p_2 + b:.3f}")
+    for k, player in [(1, args.player_1), (2, args.player_2)]:
+        print(f"{player} latency ms median p50 {stat[f'latency_{k}_p50'].median():.2f} median p99 "
+              f"{stat[f'latency_{k}_p99'].median():.2f} max {stat[f'latency_{k}_max'].max():.2f} "
+              f"(timeout {TIMEOUT_MOVE * 1e3:.0f})")
+    if args.paired:
+        scores = pair_scores(game_scores(stat, args.player_1))
+        b = 1.96 * np.sqrt(np.var(scores) / len(scores))
+        counts = {score: int(np.sum(scores == score)) for score in [0., 0.25, 0.5, 0.75, 1.]}
+        print(f"Pairs played {len(scores)}, {args.player_1} pair score counts {counts}")
+        print(f"{args.player_1} pair score 95% confidence {np.mean(scores) - b:.3f} {np.mean(scores):.3f} "
+              f"{np.mean(scores) + b:.3f}")
+    if decision is not None:
+        verdict = {1: f"{args.player_1} is stronger", -1: f"{args.player_2} is stronger", 0: "no difference"}
+        print(f"SPRT stopped after {len(pair_scores(game_scores(stat, args.player_1)))} pairs: {verdict[decision]}")
 
 
 if __name__ == "__main__":
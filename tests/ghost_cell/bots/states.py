@@ -0,0 +1,19 @@
+from ghost_cell.scenario_generator import ScenarioGenerator
+
+
+def random_state(state, factory_count, rng, players=(-1, 0, 1), blocked=False, troop_rate=0.3):
+    # Bot game state initialized from a generated map, with random factories and troops on their way
+    scenario = ScenarioGenerator.generate(factory_count=factory_count, rng=rng)
+    lines = iter([str(scenario.factory_count), str(scenario.link_count)] +
+                 [f"{s} {d} {l}" for s, d, l in scenario.links])
+    state.initialize(lambda: next(lines))
+    return randomize_state(state, rng, players, blocked, troop_rate)
+
+
+def randomize_state(state, rng, players=(-1, 0, 1), blocked=False, troop_rate=0.3):
+    for factory_id in range(state.factory_count):
+        state.update_factory(entity_id=factory_id, player=rng.choice(players), troops=rng.integers(0, 60),
+                             prod=rng.integers(0, 4), blocked=5 * rng.integers(0, 2) if blocked else 0)
+    state.troops[:, 1:, :] = rng.integers(0, 9, state.troops[:, 1:, :].shape) * \
+        (rng.random(state.troops[:, 1:, :].shape) < troop_rate)
+    return state
@@ -1,4 +1,5 @@
-from ghost_cell.bots import ghost_cell
+from ghost_cell.bots import ghost_cell, heuristic_bot
+from tests.ghost_cell.bots.states import random_state
 from collections import defaultdict
 import numpy as np
 import unittest
@@ -15,7 +16,7 @@ class MyTestCase(unittest.TestCase):
             game.distance_matrix[factory_1, factory_2], game.distance_matrix[factory_2, factory_1] = distance, distance
         game.max_distance = np.max(game.distance_matrix)
         game.factories = np.zeros((game.factory_count, 6))
-        game.troops = np.zeros((game.factory_count, game.max_distance + 1, 2), dtype=int)
+        game.troops = ghost_cell.TroopTimeline(np.zeros((game.factory_count, game.max_distance + 1, 2), dtype=int))
         game.bombs = defaultdict(list)
     
     def test_heuristic_evaluate(self):
@@ -42,5 +43,91 @@ class MyTestCase(unittest.TestCase):
         cost = ghost_cell.heuristic_evaluate(ghost_cell.Move(source=1, destination=0, cyborg_count=1), game)
         self.assertEqual(cost, 0)
 
+    def test_lookahead(self):
+        rng = np.random.default_rng(0)
+        game = ghost_cell.Game()
+        self.build_dummy_game(game, n_factories=5, links=[(i, j, rng.integers(1, 6)) for i in range(5)
+                                                           for j in range(i + 1, 5)])
+        for factory_id in range(5):
+            game.update_factory(entity_id=factory_id, player=rng.integers(-1, 2), troops=rng.integers(0, 30),
+                                prod=rng.integers(0, 4), blocked=0)
+        game.troops[:, 1:, :] = rng.integers(0, 5, game.troops[:, 1:, :].shape)
+        game.update_stats()
+        actions = [ghost_cell.Wait(), ghost_cell.IncreaseProd(factory=0)] + \
+                  [ghost_cell.Move(source=0, destination=j, cyborg_count=3) for j in range(1, 5)]
+        delta_prod, delta_troops = ghost_cell.lookahead(game, actions, n_steps=4)
+        for k, action in enumerate(actions):
+            game_proj = game.clone()
+            for step in range(1, 5):
+                game_proj.next_state(action if step == 1 else ghost_cell.Wait())
+                self.assertEqual(delta_prod[k, step], game_proj.player_production[1] - game_proj.player_production[-1])
+                self.assertEqual(delta_troops[k, step], game_proj.player_troops[1] - game_proj.player_troops[-1])
+
+    def test_troop_timeline(self):
+        rng = np.random.default_rng(0)
+        troops = rng.integers(0, 5, (3, 6, 2))
+        timeline = ghost_cell.TroopTimeline(troops.copy())
+        for _ in range(8):
+            troops = np.roll(troops, shift=-1, axis=1)
+            timeline.advance()
+            troops[1, 4, 0] += 3
+            timeline[1, 4, 0] += 3
+            np.testing.assert_array_equal(np.asarray(timeline), troops)
+            np.testing.assert_array_equal(timeline[:, 0], troops[:, 0])
+            np.testing.assert_array_equal(timeline[2, :, 1], troops[2, :, 1])
+            troops[:, 0] = 0
+            timeline[:, 0] = 0
+
+    def test_cumulative_troops(self):
+        game = ghost_cell.Game()
+        self.build_dummy_game(game, n_factories=3, links=[(0, 1, 3), (0, 2, 5), (1, 2, 2)])
+        for factory_id, player in enumerate([1, -1, 0]):
+            game.update_factory(entity_id=factory_id, player=player, troops=20, prod=2, blocked=0)
+        game.update_troop(entity_id=-1, player=-1, troops=4, distance=2, source=1, destination=0)
+        np.testing.assert_array_equal(game.cumulative_troops, np.cumsum(np.asarray(game.troops), axis=1))
+        ghost_cell.Move(source=0, destination=2, cyborg_count=6).apply(game)
+        ghost_cell.Move(source=0, destination=1, cyborg_count=3).apply(game)
+        np.testing.assert_array_equal(game.cumulative_troops, np.cumsum(np.asarray(game.troops), axis=1))
+        game.next_state(ghost_cell.Wait())
+        np.testing.assert_array_equal(game.cumulative_troops, np.cumsum(np.asarray(game.troops), axis=1))
+        self.assertIs(ghost_cell.production_incidence(6), ghost_cell.production_incidence(6))
+
+    def heuristic_game(self, factory_count, seed):
+        return random_state(heuristic_bot.Game(), factory_count, np.random.default_rng(seed))
+
+    def test_evaluate_moves(self):
+        for seed in range(20):
+            game = self.heuristic_game(2 * (seed % 5) + 7, seed)
+            factory_ids = np.arange(game.factory_count)
+            move_troops, move_roi = heuristic_bot.evaluate_moves(factory_ids, factory_ids, game)
+            inc_roi = heuristic_bot.evaluate_incs(factory_ids, game)
+            for source_id in range(game.factory_count):
+                self.assertEqual(inc_roi[source_id], heuristic_bot.evaluate_inc(source_id, game))
+                for dest_id in range(game.factory_count):
+                    if source_id != dest_id:
+                        troops, roi = heuristic_bot.evaluate_move(source_id, dest_id, game)
+                        self.assertEqual(move_troops[source_id, dest_id], troops)
+                        self.assertEqual(move_roi[source_id, dest_id], roi)
+
+    def test_get_plan(self):
+        for seed in range(20):
+            game, reference_game = self.heuristic_game(11, seed), self.heuristic_game(11, seed)
+            player = heuristic_bot.Player(player_id=1)
+            reference_plan = list()
+            # Full greedy, every action listed and scored again after each step
+            while True:
+                action_list = [a for a in player.get_actions(reference_game) if a[0].is_valid(reference_game)]
+                best_action, _ = max(action_list, key=lambda x: x[1])
+                reference_plan.append(best_action.str)
+                best_action.apply(reference_game)
+                if isinstance(best_action, heuristic_bot.Wait):
+                    break
+            self.assertSequenceEqual(player.get_plan(game, time_limit=10000), reference_plan)
+
+    def test_get_plan_deadline(self):
+        game = self.heuristic_game(15, 0)
+        self.assertSequenceEqual(heuristic_bot.Player(player_id=1).get_plan(game, time_limit=0), ["WAIT"])
+
+
 if __name__ == '__main__':
     unittest.main()
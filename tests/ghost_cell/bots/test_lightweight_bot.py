@@ -2,8 +2,10 @@ import unittest
 
 import numpy as np
 
-from ghost_cell.bots.lightweight_bot import Player, GameState, ID, PLAYER, TROOPS, PROD, BLOCKED, dijkstra
+from ghost_cell.bots.lightweight_bot import Player, GameState, ID, PLAYER, TROOPS, PROD, BLOCKED, dijkstra, \
+    floyd_warshall, PathTree, min_cost_flow
 from ghost_cell.scenario_generator import ScenarioGenerator
+from tests.ghost_cell.bots.states import random_state, randomize_state
 
 class MyTestCase(unittest.TestCase):
 
@@ -223,5 +225,110 @@ class MyTestCase(unittest.TestCase):
                 self.assertLessEqual(min_dist_matrix[source, target], scenario.distance_matrix[source, target])
         self.assertEqual(len(path_tree), 7*6)
 
+    def test_floyd_warshall(self):
+        rng = np.random.default_rng(0)
+        for factory_count in range(7, 16, 2):
+            # Small distances so that many pairs have several shortest paths
+            distance_matrix = np.triu(rng.integers(1, 5, (factory_count, factory_count)), 1)
+            distance_matrix = distance_matrix + distance_matrix.T
+            min_dist_matrix = np.zeros((factory_count, factory_count), dtype=int)
+            step_matrix = np.zeros((factory_count, factory_count), dtype=int)
+            path_tree = dict()
+            for source in range(factory_count):
+                dijkstra(distance_matrix, source, min_dist_matrix, step_matrix, path_tree)
+
+            fw_min_dist_matrix, fw_step_matrix, predecessor = floyd_warshall(distance_matrix)
+            fw_path_tree = PathTree(predecessor)
+            np.testing.assert_array_equal(fw_min_dist_matrix, min_dist_matrix)
+            np.testing.assert_array_equal(fw_step_matrix, step_matrix)
+            self.assertEqual(len(fw_path_tree), len(path_tree))
+            for pair, path in path_tree.items():
+                self.assertSequenceEqual(fw_path_tree[pair], path)
+
+    def test_vectorized_costs(self):
+        rng = np.random.default_rng(0)
+        for factory_count in range(7, 16, 2):
+            state = random_state(GameState(), factory_count, rng, blocked=True, troop_rate=0.2)
+            player = Player(player_id=1, moving_troop_dist_th=5, moving_troop_discount=0.9, stationing_troop_dist_th=3,
+                            stationing_troop_discount=0.7)
+            player._update_from_state(game_state=state)
+            factory_ids = range(state.factory_count)
+            required = np.ceil([player._required_troops_factory(factory_id) for factory_id in factory_ids])
+            reserve = np.array([player._available_troops_factory(factory_id) for factory_id in factory_ids])
+            np.testing.assert_array_equal(player.troops_required_matrix - player.prod_penalty_matrix,
+                                          np.tile(required, (state.factory_count, 1)))
+            np.testing.assert_array_equal(player.troops_reserve_vector[:, 0], np.floor(abs(reserve) * (reserve > 0)))
+
+    def test_map_tables(self):
+        state = random_state(GameState(), 11, np.random.default_rng(0))
+        player = Player(player_id=1, moving_troop_dist_th=50, moving_troop_discount=0.9, stationing_troop_dist_th=3,
+                        stationing_troop_discount=0.7)
+        player.initialize(state)
+        tables = player.troop_discount, player.stationing_discount_matrix, player.neighbour_order
+        player._update_from_state(game_state=state)
+        player._update_from_state(game_state=state)
+        self.assertEqual(player.moving_troop_dist_th, state.max_distance)
+        for table, kept in zip(tables, (player.troop_discount, player.stationing_discount_matrix,
+                                        player.neighbour_order)):
+            self.assertIs(table, kept)
+            self.assertFalse(table.flags.writeable)
+        for factory_id in range(state.factory_count):
+            np.testing.assert_array_equal(player.neighbour_order[factory_id],
+                                          np.argsort(state.distance_matrix[factory_id, :]))
+            np.testing.assert_array_equal(player.source_order[:, factory_id],
+                                          np.argsort(state.min_distance_matrix[:, factory_id]))
+
+    def test_workspace(self):
+        rng = np.random.default_rng(0)
+        state = random_state(GameState(), 11, rng)
+        player = Player(player_id=1, moving_troop_dist_th=5, moving_troop_discount=0.9, stationing_troop_dist_th=3,
+                        stationing_troop_discount=0.7)
+        for _ in range(3):
+            randomize_state(state, rng, blocked=True, troop_rate=0.2)
+            player._update_from_state(game_state=state)
+            fresh = Player(player_id=1, moving_troop_dist_th=5, moving_troop_discount=0.9, stationing_troop_dist_th=3,
+                           stationing_troop_discount=0.7)
+            fresh._update_from_state(game_state=state)
+            self.assertIs(player.troops_required_matrix, player.workspace.troops_required_matrix)
+            self.assertIs(player.troops_reserve_vector, player.workspace.troops_reserve)
+            for name in ["my_factories", "prod_penalty_matrix", "troops_required_matrix", "troops_reserve_vector"]:
+                np.testing.assert_array_equal(getattr(player, name), getattr(fresh, name))
+            player.select_plan()
+            fresh.select_plan()
+            self.assertSequenceEqual(player.action_list, fresh.action_list)
+            player.reset()
+
+    def test_min_cost_flow(self):
+        # Source 0, two factories with 5 and 4 troops, two targets asking 6 and 3, sink 5
+        capacity = np.zeros((6, 6), dtype=int)
+        cost = np.zeros((6, 6))
+        capacity[0, [1, 2]] = 5, 4
+        capacity[1:3, 3:5] = 9
+        cost[1:3, 3:5] = [[1, 2], [4, 1]]
+        capacity[[3, 4], 5] = 6, 3
+        cost[[3, 4], 5] = -10, -8
+        flow = min_cost_flow(capacity, cost)
+        np.testing.assert_array_equal(flow[1:3, 3:5], [[5, 0], [1, 3]])
+        self.assertIsNone(min_cost_flow(capacity, cost, deadline=0))
+
+    def test_flow_allocation(self):
+        rng = np.random.default_rng(0)
+        for factory_count in range(7, 16, 2):
+            state = random_state(GameState(), factory_count, rng, players=[-1, 0, 1, 1], troop_rate=0)
+            player = Player(player_id=1, moving_troop_dist_th=5, moving_troop_discount=1., stationing_troop_dist_th=3,
+                            stationing_troop_discount=0.7, allocator="flow")
+            player._update_from_state(game_state=state)
+            reserve = player.troops_reserve_vector[:, 0].copy()
+            _, max_required_target = player._prioritize_target()
+            sent, received = np.zeros(state.factory_count), np.zeros(state.factory_count)
+            for source_id, target_id, n_cyborgs in player._flow_allocation(deadline=None):
+                self.assertTrue(player.my_factories[source_id])
+                sent[source_id] += n_cyborgs
+                received[target_id] += n_cyborgs
+            self.assertTrue(np.all(sent <= reserve))
+            served = received > 0
+            np.testing.assert_array_equal(received[served], max_required_target[served])
+
+
 if __name__ == '__main__':
     unittest.main()
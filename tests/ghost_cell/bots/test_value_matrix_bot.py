@@ -0,0 +1,51 @@
+from ghost_cell.bots.value_matrix_bot import GameState, Player
+from tests.ghost_cell.bots.states import random_state
+import numpy as np
+import unittest
+
+
+class MyTestCase(unittest.TestCase):
+
+    def value_matrix_state(self, factory_count, seed):
+        return random_state(GameState(), factory_count, np.random.default_rng(seed), players=[-1, 0, 1, 1])
+
+    def test_select_move_incremental_values(self):
+        moves = 0
+        for seed in range(20):
+            state = self.value_matrix_state(2 * (seed % 5) + 7, seed)
+            player = Player(player_id=1, moving_troop_dist_th=100, moving_troop_discount=0.99,
+                            stationing_troop_dist_th=100, stationing_troop_discount=0.7)
+            player._update_from_state(state)
+            player.select_move()
+            moves += len(player.action_list)
+            required_move = player.troops_required_matrix > 0
+            ratio = player.troops_reserve_matrix / (player.troops_required_matrix + 1e-6) * required_move
+            values = required_move * player.target_value_matrix * player.distance_penalty_matrix * ratio
+            np.testing.assert_array_equal(player.troops_ratio_matrix, ratio)
+            np.testing.assert_array_equal(player.move_value_matrix, values)
+            np.testing.assert_allclose(player.move_value_sums, np.sum(values, axis=0), atol=1e-9)
+            self.assertEqual(player.troops_required_sum, np.sum(player.troops_required_matrix))
+        self.assertGreater(moves, 0)
+
+    def test_select_move_plan(self):
+        plans = {2: ["MOVE 5 4 39", "MOVE 1 10 16", "MOVE 5 10 9", "MOVE 7 10 5"],
+                 3: ["MOVE 1 5 5", "MOVE 1 2 7", "MOVE 10 8 34", "MOVE 1 8 30", "MOVE 12 6 24", "MOVE 0 6 22"],
+                 4: ["MOVE 6 13 26", "MOVE 5 2 19", "MOVE 6 10 26", "MOVE 5 10 17", "MOVE 11 3 17", "MOVE 9 3 12",
+                     "MOVE 0 8 7"]}
+        for seed in range(50):
+            state = self.value_matrix_state(2 * (seed % 5) + 7, seed)
+            player = Player(player_id=1, moving_troop_dist_th=100, moving_troop_discount=0.99,
+                            stationing_troop_dist_th=100, stationing_troop_discount=0.7)
+            player._update_from_state(state)
+            ordered_targets = list(reversed(np.argsort(player.move_value_sums)))
+            player.select_move()
+            if seed in plans:
+                self.assertListEqual(player.action_list, plans[seed])
+            # Targets follow the order of their values before the first move
+            targets = [int(action.split(" ")[2]) for action in player.action_list]
+            ranks = [ordered_targets.index(target_id) for target_id in targets]
+            self.assertListEqual(ranks, sorted(ranks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+
+from ghost_cell.array_scenario import ArrayScenario, explode_bombs, TROOPS, BLOCKED, DIST
+from ghost_cell.batch_scenario import BatchScenario
+from ghost_cell.entities import Factory, Bomb, MovingEntity, MovingTroop
+from ghost_cell.player import in_process_player, IN_PROCESS_PLAYERS, InProcessPlayer
+from ghost_cell.scenario import LATENCY_COLUMNS, join_input
+from ghost_cell.scenario_generator import ScenarioGenerator
+from ghost_cell.constants import TIMEOUT_MOVE
+
+
+class RecordingPlayer(InProcessPlayer):
+
+    def __init__(self, bot_name, record):
+        super().__init__()
+        self.bot = in_process_player(bot_name)
+        self.record = record
+
+    def play(self, input_str):
+        self.record.append(input_str)
+        return self.bot.play(input_str)
+
+
+class ScenarioTest(unittest.TestCase):
+
+    def test_in_process_match(self):
+        for bot_name in IN_PROCESS_PLAYERS:
+            scenario = ScenarioGenerator.generate(factory_count=9)
+            scenario.players = {1: in_process_player(bot_name), -1: in_process_player("lightweight_bot.py")}
+            scenario.match()
+            self.assertIn(scenario.winner, [-1, 0, 1])
+            self.assertNotIn(scenario.win_condition, ["timeout", "invalid action"])
+            latency = scenario.latency_array
+            self.assertEqual(latency.shape[1], len(LATENCY_COLUMNS))
+            self.assertEqual(set(latency[:, LATENCY_COLUMNS.index("player")]), {-1, 1})
+            self.assertTrue(np.all(latency[:, LATENCY_COLUMNS.index("total")] < TIMEOUT_MOVE))
+
+    def test_array_scenario_same_outcome(self):
+        for seed, factory_count in enumerate([7, 11, 15]):
+            np.random.seed(seed)
+            scenario = ScenarioGenerator.generate(factory_count=factory_count)
+            array_scenario = ArrayScenario.from_scenario(scenario)
+            self.assertLessEqual(set(vars(scenario)), set(vars(array_scenario)))
+            records = list()
+            for s in [scenario, array_scenario]:
+                record = list()
+                s.players = {1: RecordingPlayer("lightweight_bot.py", record),
+                             -1: RecordingPlayer("value_matrix_bot.py", record)}
+                s.match()
+                records.append(record)
+            self.assertListEqual(records[0], records[1])
+            self.assertEqual(scenario.winner, array_scenario.winner)
+            self.assertEqual(scenario.turn, array_scenario.turn)
+            self.assertEqual(list(scenario.score.items()), list(array_scenario.score.items()))
+
+    def test_batch_scenario_same_outcome(self):
+        np.random.seed(0)
+        scenarios = [ScenarioGenerator.generate(factory_count=n) for n in [7, 9, 12, 15]]
+        batch = BatchScenario(scenarios)
+        batch_records = [list() for _ in scenarios]
+        for game, record in zip(batch.games, batch_records):
+            game.players = {1: RecordingPlayer("lightweight_bot.py", record),
+                            -1: RecordingPlayer("champion.py", record)}
+        batch.match()
+        for scenario, game, batch_record in zip(scenarios, batch.games, batch_records):
+            record = list()
+            array_scenario = ArrayScenario.from_scenario(scenario)
+            array_scenario.players = {1: RecordingPlayer("lightweight_bot.py", record),
+                                      -1: RecordingPlayer("champion.py", record)}
+            array_scenario.match()
+            self.assertListEqual(record, batch_record)
+            self.assertEqual(array_scenario.winner, game.winner)
+            self.assertEqual(array_scenario.turn, game.turn)
+            self.assertEqual(list(array_scenario.score.items()), list(game.score.items()))
+
+    def test_explode_bombs(self):
+        for troops in [3, 15, 40]:
+            factory, other = Factory(0, 1, troops, 1), Factory(1, -1, 0, 1)
+            for _ in range(2):
+                Bomb(entity_id=0, player=-1, source=other, destination=factory, distance=0).explode()
+            factories = np.zeros((2, 6), dtype=int)
+            factories[0, TROOPS] = troops
+            explode_bombs(factories, np.array([0, 0]))
+            self.assertEqual(factories[0, TROOPS], factory.troops)
+            self.assertEqual(factories[0, BLOCKED], factory.blocked)
+
+    def test_troop_pool(self):
+        scenario = ScenarioGenerator.generate(factory_count=7, rng=np.random.default_rng(0))
+        scenario.players = {1: in_process_player("wait_player.py"), -1: in_process_player("wait_player.py")}
+        created = dict()
+        for turn in range(30):
+            for player, destination in [(1, 3 + turn % 4), (-1, 3 + (turn + 2) % 4)]:
+                source = [factory.entity_id for factory in scenario.factories if factory.player == player][0]
+                scenario.apply_action(f"MOVE {source} {destination} 1", player)
+            scenario.play()
+            for troop_id, troop in scenario.troops.items():
+                created.setdefault(id(troop), troop_id)
+                self.assertEqual(troop.entity_id, troop_id)
+        self.assertGreater(scenario.troop_id, len(created))
+        self.assertFalse(hasattr(MovingTroop(0, 1, None, None, 1, 1), "__dict__"))
+        troop = scenario.troop_pool.acquire(entity_id=3, player=-1, source=scenario.factories[1],
+                                            destination=scenario.factories[2], troops=4, arrival=2)
+        fresh = MovingTroop(3, -1, scenario.factories[1], scenario.factories[2], 4, 2)
+        self.assertEqual([getattr(troop, slot) for slot in MovingTroop.__slots__ + MovingEntity.__slots__],
+                         [getattr(fresh, slot) for slot in MovingTroop.__slots__ + MovingEntity.__slots__])
+
+    def test_troop_arrivals(self):
+        scenario = ScenarioGenerator.generate(factory_count=7, rng=np.random.default_rng(1))
+        scenario.players = {1: in_process_player("wait_player.py"), -1: in_process_player("wait_player.py")}
+        source = [factory for factory in scenario.factories if factory.player == 1][0]
+        distance, troops = scenario.distance_matrix[source.entity_id, 0], source.troops
+        scenario.apply_action(f"MOVE {source.entity_id} 0 {troops}", 1)
+        self.assertSequenceEqual(scenario.arrivals[distance], [0])
+        for turn in range(1, distance):
+            scenario.play()
+            line = f"0 TROOP 1 {source.entity_id} 0 {troops} {distance - turn}"
+            self.assertEqual(scenario.input[1].split("\n")[-1], line)
+            self.assertEqual(join_input([], [scenario.troop_line(scenario.troops[0])], 1), line)
+            self.assertEqual(ArrayScenario.from_scenario(scenario).troops[0, DIST], distance - turn)
+        scenario.play()
+        self.assertNotIn(0, scenario.troops)
+        self.assertNotIn(distance, scenario.arrivals)
+
+
+if __name__ == '__main__':
+    unittest.main()
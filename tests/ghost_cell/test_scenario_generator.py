@@ -1,7 +1,11 @@
 import unittest
-from ghost_cell.constants import MIN_TOTAL_PRODUCTION_RATE, PLAYER_INIT_UNITS_MIN,\
-    PLAYER_INIT_UNITS_MAX
-from ghost_cell.scenario_generator import ScenarioGenerator
+import tempfile
+
+import numpy as np
+
+from ghost_cell.constants import MIN_TOTAL_PRODUCTION_RATE, PLAYER_INIT_UNITS_MIN, MIN_FACTORY_COUNT, MAX_FACTORY_COUNT,\
+    PLAYER_INIT_UNITS_MAX, WIDTH, HEIGHT, EXTRA_SPACE_BETWEEN_FACTORIES
+from ghost_cell.scenario_generator import ScenarioGenerator, MapCorpus, place_factories
 
 class ScenarioGeneratorTest(unittest.TestCase):
 
@@ -26,6 +30,38 @@ class ScenarioGeneratorTest(unittest.TestCase):
             total_prod = sum([f.prod for f in scenario.factories])
             self.assertGreaterEqual(total_prod, MIN_TOTAL_PRODUCTION_RATE)
 
+    def test_seed(self):
+        for n_factory in range(7, 15):
+            scenarios = [ScenarioGenerator.generate(n_factory, rng=np.random.default_rng(n_factory)) for _ in range(2)]
+            self.assertEqual(scenarios[0].links, scenarios[1].links)
+            self.assertEqual([(f.player, f.troops, f.prod) for f in scenarios[0].factories],
+                             [(f.player, f.troops, f.prod) for f in scenarios[1].factories])
+
+    def test_place_factories(self):
+        for seed in range(30):
+            factory_count = 2 * (seed % 5) + 7
+            factory_radius = 600 if factory_count > 10 else 700
+            points = place_factories(factory_count, factory_radius, np.random.default_rng(seed).integers)
+            gaps = np.sqrt(np.sum((points[:, None, :] - points[None, :, :]) ** 2, axis=2))
+            gaps = gaps[~np.eye(factory_count, dtype=bool)]
+            self.assertTrue(np.all(gaps >= 2 * (factory_radius + EXTRA_SPACE_BETWEEN_FACTORIES)))
+            np.testing.assert_array_equal(points[1::2] + points[2::2],
+                                          np.tile([WIDTH, HEIGHT], (factory_count // 2, 1)))
+
+    def test_corpus(self):
+        with tempfile.TemporaryDirectory() as path:
+            ScenarioGenerator.generate_corpus(path, n_maps=20, rng=np.random.default_rng(0))
+            corpus = MapCorpus(path)
+            rng = np.random.default_rng(0)
+            n_factories = rng.integers(MIN_FACTORY_COUNT, MAX_FACTORY_COUNT, 20)
+            self.assertEqual(len(corpus), 20)
+            for index, n_factory in enumerate(n_factories):
+                scenario = ScenarioGenerator.generate(n_factory, rng=rng)
+                corpus_scenario = corpus.scenario(index)
+                self.assertEqual(scenario.links, corpus_scenario.links)
+                self.assertEqual([(f.player, f.troops, f.prod) for f in scenario.factories],
+                                 [(f.player, f.troops, f.prod) for f in corpus_scenario.factories])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+import csv
+import os
+import sys
+import tempfile
+import unittest
+from subprocess import Popen, PIPE
+from unittest.mock import patch
+
+import numpy as np
+
+from ghost_cell.simulate import BotPool, Simulator, get_bot_pool, game_plan, pair_scores, sprt, play_games, \
+    recorded_seed, main, RESULT_FIELDS
+from ghost_cell.player import in_process_player
+from ghost_cell.scenario_generator import ScenarioGenerator
+
+
+class SimulateTest(unittest.TestCase):
+
+    def test_bot_pool_reuses_workers(self):
+        pids = set()
+        for _ in range(3):
+            Simulator.simulate(9, "wait_player.py", "lightweight_bot.py", persistent=True)
+            pids |= {bot.pid for bots in get_bot_pool().idle.values() for bot in bots}
+        self.assertEqual(len(pids), 2)
+
+    def test_bot_pool_respawns_dead_worker(self):
+        bot_pool = BotPool()
+        bot = bot_pool.acquire("wait_player.py")
+        bot_pool.release("wait_player.py", bot)
+        bot.kill()
+        bot.wait()
+        new_bot = bot_pool.acquire("wait_player.py")
+        self.assertNotEqual(new_bot.pid, bot.pid)
+        bot_pool.release("wait_player.py", new_bot, reusable=False)
+        self.assertEqual(len(bot_pool.idle["wait_player.py"]), 0)
+
+    def test_crashed_bot_loses(self):
+        scenario = ScenarioGenerator.generate(factory_count=9)
+        crashing_bot = Popen([sys.executable, "-c", "import sys; sys.stdin.readline()"], stdin=PIPE, stdout=PIPE,
+                             text=True)
+        scenario.players = {1: in_process_player("wait_player.py"), -1: crashing_bot}
+        scenario.match()
+        crashing_bot.wait()
+        self.assertEqual(scenario.winner, 1)
+        self.assertEqual(scenario.win_condition, "crash")
+
+    def test_paired_games_share_map(self):
+        first, second = game_plan(0, 6, paired=True), game_plan(0, 7, paired=True)
+        self.assertEqual(first[1:4], second[1:4])
+        self.assertEqual((first[4], second[4]), (1, -1))
+        records = [Simulator.simulate(factory_count, "lightweight_bot.py", "champion.py", in_process=True, seed=seed,
+                                      side=side) for _, _, factory_count, seed, side in [first, second]]
+        self.assertEqual(records[0]["factory_count"], records[1]["factory_count"])
+        self.assertEqual(records[0]["seed"], records[1]["seed"])
+
+    def test_sprt(self):
+        self.assertEqual(list(pair_scores({0: 1., 1: 0.5, 2: 0., 4: 1., 5: 1.})), [0.75, 1.])
+        self.assertIsNone(sprt(np.ones(3)))
+        self.assertEqual(sprt(np.ones(20)), 1)
+        self.assertEqual(sprt(np.zeros(20)), -1)
+        self.assertEqual(sprt(np.tile([0., 0.5, 1.], 400)), 0)
+
+    def test_recorded_seed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_path = os.path.join(directory, "results.csv")
+            records = play_games([game_plan(7, game_id) for game_id in range(2)], "wait_player.py",
+                                 "lightweight_bot.py", in_process=True, engine="object", persistent=False,
+                                 batch=False, simulation_seed=7)
+            with open(output_path, "w", newline="") as output:
+                writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS)
+                writer.writeheader()
+                writer.writerows(records)
+            self.assertEqual(recorded_seed(output_path), 7)
+            replay = play_games([game_plan(recorded_seed(output_path), 1)], "wait_player.py", "lightweight_bot.py",
+                                in_process=True, engine="object", persistent=False, batch=False)[0]
+            for column in ["seed", "factory_count", "turn", "win"]:
+                self.assertEqual(replay[column], records[1][column])
+            argv = ["simulate", "--n_sim", "3", "--player_1", "wait_player.py", "--player_2", "lightweight_bot.py",
+                    "--parallel", "", "--in_process", "--output", output_path, "--resume", "--seed", "8"]
+            with patch.object(sys, "argv", argv), self.assertRaises(SystemExit):
+                main()
+            with open(output_path, "a", newline="") as output:
+                csv.DictWriter(output, fieldnames=RESULT_FIELDS).writerow({**records[0], "game": 2,
+                                                                           "simulation_seed": 8})
+            self.assertRaises(ValueError, recorded_seed, output_path)